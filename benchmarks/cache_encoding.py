@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Compare cache value size against encode and decode time of cache value formats.
+
+Usage: python benchmarks/cache_encoding.py [number of nodes]
+"""
+import os
+import random
+import sys
+import timeit
+
+# Import djedi from this checkout, without installing it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from django.conf import settings  # noqa: E402
+
+settings.configure(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+
+from cio.utils.uri import URI  # noqa: E402
+from djedi.backends.django.cache.backend import (  # noqa: E402
+    VALUE_VERSION,
+    DjangoCacheBackend,
+    lz4,
+)
+
+LETTERS = "etaoinshrdlucmfwypvbgkjqxz"
+
+
+class TextGenerator:
+    """
+    Pseudo text of zipf distributed words of zipf distributed letters,
+    compressing like natural language rather than a repeated paragraph.
+    """
+
+    def __init__(self, seed=1, size=5000):
+        self.rng = random.Random(seed)
+        weights = [1 / (rank + 1) for rank in range(len(LETTERS))]
+        self.words = [
+            "".join(self.rng.choices(LETTERS, weights, k=self.rng.randint(1, 9)))
+            for _ in range(size)
+        ]
+        self.weights = [1 / (rank + 1) for rank in range(size)]
+
+    def sentence(self, min_words, max_words):
+        count = self.rng.randint(min_words, max_words)
+        words = self.rng.choices(self.words, self.weights, k=count)
+        return " ".join(words).capitalize()
+
+    def paragraph(self):
+        sentences = (self.sentence(4, 20) for _ in range(self.rng.randint(1, 6)))
+        return "<p>" + ". ".join(sentences) + ".</p>"
+
+
+def build_nodes(count):
+    # Mix of short titles and bodies of 1-10 paragraphs
+    text = TextGenerator()
+    nodes = {}
+    for i in range(count):
+        if i % 2:
+            content = f"<h1>{text.sentence(1, 8)}</h1>"
+        else:
+            paragraphs = (text.paragraph() for _ in range(text.rng.randint(1, 10)))
+            content = "\n".join(paragraphs)
+        nodes[URI(f"i18n://sv-se@page/section-{i}/body.md#{i}")] = content
+    return nodes
+
+
+def main(count=10000, repeat=5):
+    nodes = build_nodes(count)
+
+    formats = [
+        ("legacy text", {}),
+        ("binary zlib 1", {"VALUE_FORMAT": {"COMPRESSION": "zlib", "LEVEL": 1}}),
+        ("binary zlib 6", {"VALUE_FORMAT": {"COMPRESSION": "zlib", "LEVEL": 6}}),
+    ]
+    if lz4 is not None:
+        formats.append(("binary lz4", {"VALUE_FORMAT": {"COMPRESSION": "lz4"}}))
+
+    print(f"{count} nodes, best of {repeat} runs\n")
+    print(
+        f"{'format':<16}{'bytes':>12}{'saved':>8}{'binary':>8}"
+        f"{'encode ms':>12}{'decode ms':>12}"
+    )
+    baseline = None
+    for name, config in formats:
+        backend = DjangoCacheBackend(**config)
+        values = backend._prepare_nodes(nodes)
+        size = sum(len(value) for value in values.values())
+        baseline = baseline or size
+        binary = sum(value[:1] == VALUE_VERSION for value in values.values())
+
+        encode = timeit.repeat(
+            lambda: backend._prepare_nodes(nodes), number=1, repeat=repeat
+        )
+        decode = timeit.repeat(
+            lambda: [backend._decode_content(value) for value in values.values()],
+            number=1,
+            repeat=repeat,
+        )
+        print(
+            f"{name:<16}{size:>12}{1 - size / baseline:>8.0%}{binary / count:>8.0%}"
+            f"{min(encode) * 1000:>12.2f}{min(decode) * 1000:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
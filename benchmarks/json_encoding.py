@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Compare payload size and encode time of node map json encoders.
+
+Usage: python benchmarks/json_encoding.py [number of nodes]
+"""
+import os
+import sys
+import timeit
+
+# Import djedi from this checkout, without installing it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simplejson as json  # noqa: E402
+
+from cio.utils.uri import URI  # noqa: E402
+from djedi.utils.encoding import (  # noqa: E402
+    iter_json_mapping,
+    orjson,
+    orjson_dumps,
+    simplejson_dumps,
+)
+
+
+def build_nodes(count):
+    return {
+        URI(f"i18n://sv-se@page/section-{i}/title.md#{i}"): (
+            f"<h1>Title {i}</h1>\n<p>Lorem ipsum <em>dolor</em> sit amet, {i}.</p>"
+        )
+        for i in range(count)
+    }
+
+
+def main(count=10000, repeat=10):
+    nodes = build_nodes(count)
+
+    encoders = [
+        ("simplejson indent=4", lambda: json.dumps(nodes, indent=4, for_json=True)),
+        ("simplejson compact", lambda: simplejson_dumps(nodes)),
+    ]
+    if orjson is not None:
+        encoders.append(("orjson compact", lambda: orjson_dumps(nodes)))
+    encoders.append(("stream chunks", lambda: b"".join(iter_json_mapping(nodes))))
+
+    print(f"{count} nodes, best of {repeat} runs\n")
+    print(f"{'encoder':<22}{'bytes':>12}{'ms':>10}")
+    for name, encode in encoders:
+        payload = encode()
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        seconds = min(timeit.repeat(encode, number=1, repeat=repeat))
+        print(f"{name:<22}{len(payload):>12}{seconds * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
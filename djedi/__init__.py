@@ -45,6 +45,13 @@ def configure():
         },
         "CACHE": "djedi.backends.django.cache.Backend",
         "STORAGE": "djedi.backends.django.db.Backend",
+        "PIPELINE": [
+            "djedi.pipeline.CachePipe",
+            "cio.pipeline.pipes.meta.MetaPipe",
+            "djedi.pipeline.PluginPipe",
+            "djedi.pipeline.StoragePipe",
+            "djedi.pipeline.NamespaceFallbackPipe",
+        ],
         "PLUGINS": [
             "cio.plugins.txt.TextPlugin",
             "cio.plugins.md.MarkdownPlugin",
@@ -65,6 +72,8 @@ def configure():
         "PLUGINS",
         "THEME",
         "XSS_DOMAIN",
+        "JSON",
+        "ESI",
     ):
         conf = getattr(django_settings, "DJEDI_%s" % setting, None)
         if conf is not None:
@@ -1,16 +1,20 @@
 from collections import defaultdict
 from urllib.parse import unquote
 
+import simplejson as json
 from django.core.exceptions import PermissionDenied
 from django.http import Http404, HttpResponse, HttpResponseBadRequest
 from django.template.response import TemplateResponse
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import never_cache
+from django.views.decorators.cache import cache_control, never_cache
 from django.views.decorators.clickjacking import xframe_options_exempt
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 
 import cio
+from cio.backends import cache, storage
+from cio.conf import settings
+from cio.pipeline.pipes.meta import MetaPipe
 from cio.plugins import plugins
 from cio.plugins.exceptions import UnknownPlugin
 from cio.utils.uri import URI
@@ -78,10 +82,11 @@ class APIView(View):
 
 
 class NodeApi(JSONResponseMixin, APIView):
-    @method_decorator(never_cache)
+    @method_decorator(cache_control(private=True, no_cache=True))
     def get(self, request, uri):
         """
         Return published node or specified version.
+        Supports conditional requests through ETag and If-None-Match.
 
         JSON Response:
             {uri: x, content: y}
@@ -92,7 +97,9 @@ class NodeApi(JSONResponseMixin, APIView):
         if node.content is None:
             raise Http404
 
-        return self.render_to_json({"uri": node.uri, "content": node.content})
+        return self.render_to_conditional_json(
+            request, {"uri": node.uri, "content": node.content}
+        )
 
     def post(self, request, uri):
         """
@@ -137,6 +144,162 @@ class PublishApi(JSONResponseMixin, APIView):
         return self.render_to_json(node)
 
 
+class BulkNodeApi(JSONResponseMixin, APIView):
+    def post(self, request):
+        """
+        Set node data for many uris at once, return rendered nodes.
+
+        JSON Request:
+            {uri: data, ...}
+
+        JSON Response:
+            {uri: {uri: x, content: y, meta: z}, ...}
+        """
+        nodes = {}
+        for uri, data in json.loads(request.body).items():
+            uri = URI(uri)
+            uri = uri.clone(
+                ext=uri.ext or settings.URI_DEFAULT_EXT,
+                version=uri.version or "draft",
+            )
+            uri = storage._clean_set_uri(uri)
+            plugin = plugins.resolve(uri)
+            nodes[uri] = plugin.save(data)
+
+        meta = {
+            "author": auth.get_username(request),
+            "modified_at": MetaPipe()._utc_timestamp(),
+        }
+        nodes = storage.backend.set_many(nodes, **meta)
+
+        return self.render_to_json(self.render_nodes(nodes))
+
+    def put(self, request):
+        """
+        Publish many versioned uris at once, draft if no version specified.
+
+        JSON Request:
+            [uri, ...]
+
+        JSON Response:
+            {uri: {uri: x, content: y, meta: z}, ...}
+        """
+        uris = []
+        for uri in json.loads(request.body):
+            uri = URI(uri)
+            uri = storage._clean_publish_uri(uri.clone(version=uri.version or "draft"))
+            uris.append(uri)
+
+        meta = {"published_at": MetaPipe()._utc_timestamp()}
+        nodes = self.render_nodes(storage.backend.publish_many(uris, **meta))
+        cache.set_many({node["uri"]: node["content"] for node in nodes.values()})
+
+        return self.render_to_json(nodes)
+
+    def render_nodes(self, nodes):
+        for node in nodes.values():
+            rendered = node["meta"].pop("rendered", None)
+            if rendered is None:
+                plugin = plugins.resolve(node["uri"])
+                rendered = plugin.render(plugin.load(node["content"]))
+            node["content"] = rendered
+        return nodes
+
+
+class BatchApi(JSONResponseMixin, APIView):
+    methods = ("get", "load", "revisions")
+
+    @method_decorator(never_cache)
+    def post(self, request):
+        """
+        Run node api calls for many uris at once, sharing queries between them.
+
+        JSON Request:
+            {get: [uri, ...], load: [uri, ...], revisions: [uri, ...]}
+
+        JSON Response:
+            {
+                get: {uri: {uri: x, content: y} | null, ...},
+                load: {uri: {uri: x, data: y, content: z, meta: {}}, ...},
+                revisions: {uri: [[uri, state], ...], ...},
+            }
+        """
+        batch = json.loads(request.body)
+        unknown_methods = set(batch) - set(self.methods)
+        if unknown_methods:
+            raise ValueError(
+                "Unknown batch methods: %s" % ", ".join(sorted(unknown_methods))
+            )
+
+        response = {}
+        for method, uris in batch.items():
+            uris = [URI(uri) for uri in uris]
+            response[method] = getattr(self, "batch_%s" % method)(uris)
+
+        return self.render_to_json(response)
+
+    def batch_get(self, uris):
+        # Buffer all nodes to resolve them in a single pipeline flush
+        nodes = {uri: cio.get(uri) for uri in uris}
+        return {
+            uri: (
+                {"uri": node.uri, "content": node.content}
+                if node.content is not None
+                else None
+            )
+            for uri, node in nodes.items()
+        }
+
+    def batch_load(self, uris):
+        def uri_chain(uri):
+            if uri.version:
+                yield uri
+            if uri.version != "draft":
+                yield uri.clone(version="draft")
+            yield uri.clone(version=None)
+
+        # Try to get nodes from storage in order: given version, draft, published
+        chains = {uri: list(uri_chain(uri)) for uri in uris}
+        stored_nodes = {}
+        while chains:
+            # Requested uris may share a level uri, e.g. page/title and page/title#draft
+            level_uris = {}
+            for uri, chain in chains.items():
+                level_uris.setdefault(chain.pop(0), []).append(uri)
+
+            for level_uri, node in storage.get_many(level_uris.keys()).items():
+                for uri in level_uris[level_uri]:
+                    stored_nodes[uri] = dict(node, meta=dict(node["meta"]))
+                    chains.pop(uri)
+
+            chains = {uri: chain for uri, chain in chains.items() if chain}
+
+        nodes = {}
+        for uri in uris:
+            node = stored_nodes.get(uri)
+            if node:
+                # Load node data with related plugin
+                plugin = plugins.resolve(node["uri"])
+                node["meta"].pop("rendered", None)
+                node["data"] = plugin.load(node.pop("content"))
+                node["content"] = plugin.render(node["data"])
+            else:
+                # Initialize non-existing node without version
+                _uri = uri.clone(ext=uri.ext or settings.URI_DEFAULT_EXT, version=None)
+                plugins.resolve(_uri)
+                node = {"uri": _uri, "data": None, "content": None, "meta": {}}
+            nodes[uri] = node
+
+        return nodes
+
+    def batch_revisions(self, uris):
+        revisions = storage.backend.get_revisions_many(storage._clean_get_uris(uris))
+        return {
+            uri: [list(revision) for revision in uri_revisions]
+            for uri, uri_revisions in revisions.items()
+        }
+
+
 class RevisionsApi(JSONResponseMixin, APIView):
     def get(self, request, uri):
         """
@@ -163,6 +326,7 @@ class LoadApi(JSONResponseMixin, APIView):
         """
         uri = self.decode_uri(uri)
         node = cio.load(uri)
+        node["meta"].pop("rendered", None)
         return self.render_to_json(node)
 
 
@@ -208,6 +372,7 @@ class NodeEditor(JSONResponseMixin, DjediContextMixin, APIView):
         node = cio.set(uri, data, publish=False, **meta)
 
         context = cio.load(node.uri)
+        context["meta"].pop("rendered", None)
         context["content"] = node.content
 
         # is_ajax call?
@@ -1,11 +1,13 @@
-import simplejson as json
+from hashlib import sha1
+
 from django.conf import settings as django_settings
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
 
 import djedi
 from cio.conf import settings
 
-# TODO: Switch simplejson to ujson or other?
+from ..utils.encoding import iter_json_mapping, json_dumps
 
 
 class JSONResponseMixin:
@@ -14,6 +16,7 @@ class JSONResponseMixin:
     """
 
     response_class = HttpResponse
+    streaming_response_class = StreamingHttpResponse
 
     def render_to_json(self, context, **response_kwargs):
         """
@@ -24,9 +27,28 @@ class JSONResponseMixin:
             self.convert_context_to_json(context), **response_kwargs
         )
 
+    def render_to_conditional_json(self, request, context, **response_kwargs):
+        """
+        Returns a JSON response tagged with a content hash ETag, for GET requests,
+        or 304 Not Modified if the ETag matches the request If-None-Match header.
+        """
+        response = self.render_to_json(context, **response_kwargs)
+        etag = quote_etag(sha1(response.content).hexdigest())
+        response["ETag"] = etag
+        return get_conditional_response(request, etag=etag, response=response)
+
+    def render_to_json_stream(self, mapping, **response_kwargs):
+        """
+        Returns a streaming JSON response, encoding the mapping a chunk of items at a time.
+        """
+        response_kwargs["content_type"] = "application/json"
+        return self.streaming_response_class(
+            iter_json_mapping(mapping), **response_kwargs
+        )
+
     def convert_context_to_json(self, context):
         """Convert the context dictionary into a JSON object"""
-        return json.dumps(context, indent=4, for_json=True)
+        return json_dumps(context, indent=settings.get("JSON", {}).get("INDENT", 4))
 
 
 class DjediContextMixin:
@@ -1,6 +1,15 @@
 from django.urls import include, re_path
 
-from .api import LoadApi, NodeApi, NodeEditor, PublishApi, RenderApi, RevisionsApi
+from .api import (
+    BatchApi,
+    BulkNodeApi,
+    LoadApi,
+    NodeApi,
+    NodeEditor,
+    PublishApi,
+    RenderApi,
+    RevisionsApi,
+)
 from .cms import DjediCMS
 
 app_name = "djedi"
@@ -14,6 +23,8 @@ urlpatterns = [
         r"^node/(?P<uri>.+)/revisions$", RevisionsApi.as_view(), name="api.revisions"
     ),
     re_path(r"^node/(?P<uri>.+)$", NodeApi.as_view(), name="api"),
+    re_path(r"^nodes$", BulkNodeApi.as_view(), name="api.nodes"),
+    re_path(r"^batch$", BatchApi.as_view(), name="api.batch"),
     re_path(r"^plugin/(?P<ext>\w+)$", RenderApi.as_view(), name="api.render"),
     re_path(r"^api/", include("djedi.rest.urls", namespace="rest")),
 ]
@@ -0,0 +1,112 @@
+"""
+Async entry point, resolving nodes through the pipeline for ASGI deployments.
+
+Pipes implementing async handlers, e.g. ``aget_request``, are awaited directly, reaching
+the async cache and storage backend variants without thread pool round trips. Handlers of
+pipes never blocking on I/O, i.e. content-io's meta and plugin pipes or pipes flagged with
+``non_blocking = True``, are called directly. Handlers of other pipes are run in a thread
+through ``sync_to_async``.
+
+Nodes are resolved in the content-io environment of the current context, e.g. the language
+activated by the djedi middlewares for the request, and logged to its pipeline history, see
+``djedi.state``. Tasks started outside requests share the history of the context they were
+started from, unless calling ``djedi.state.activate()``.
+"""
+from asgiref.sync import sync_to_async
+
+from cio.environment import env
+from cio.node import Node
+from cio.pipeline import pipeline
+from cio.pipeline.pipes.meta import MetaPipe
+from cio.pipeline.pipes.plugin import PluginPipe
+
+# Pipes never blocking on I/O, with handlers called directly instead of in a thread
+NON_BLOCKING_PIPES = (MetaPipe, PluginPipe)
+
+__all__ = ["get", "get_many"]
+
+
+async def get(uri, default=None):
+    """
+    Resolve a single node, like cio.get(uri, default, lazy=False).
+    """
+    nodes = await get_many({uri: default})
+    return nodes[uri]
+
+
+async def get_many(uris):
+    """
+    Resolve many nodes in a single pipeline pass.
+    Takes an iterable of uris or a dict of {uri: default, ...},
+    and returns request uri map of nodes:
+        {uri: node, ...}
+    """
+    if not isinstance(uris, dict):
+        uris = dict.fromkeys(uris)
+
+    nodes, requested = {}, {}
+    for uri, default in uris.items():
+        node = Node(uri, default)
+
+        # Set URI namespace to current environment scheme, if not set
+        if not node.uri.namespace:
+            namespace = getattr(env, node.uri.scheme)[0]
+            node.uri = node.uri.clone(namespace=namespace)
+
+        nodes[uri] = node
+        requested.setdefault(node.uri, node)
+
+    # Send only distinct uris, and let duplicates share the result
+    sent_nodes = {node: requested[node.uri] for node in nodes.values()}
+    await send("get", *requested.values())
+    for node, sent_node in sent_nodes.items():
+        if sent_node is not node:
+            node.uri = sent_node.uri
+            node.content = sent_node.content
+
+    return nodes
+
+
+async def send(method, *nodes):
+    """
+    Async variant of PipelineHandler.send.
+    """
+    request = {node.uri: node for node in nodes}
+    response_chain = []
+
+    # Iterate request chain
+    for request_handler, response_handler in pipeline._pipeline[method]:
+        pipe_response = None
+        if request_handler:
+            pipe_response = await _call(request_handler, request)
+
+        # Build response chain
+        response_chain.append((response_handler, pipe_response))
+
+        # Go no further in pipeline if out of node requests
+        if not request:
+            break
+
+    # Turn request to response
+    response = request
+
+    # Iterate response chain
+    for response_handler, pipe_response in reversed(response_chain):
+        if response and response_handler:
+            response = await _call(response_handler, response)
+        if pipe_response:
+            response.update(pipe_response)
+
+    pipeline.history.log(method, *response.values())
+
+    return response
+
+
+async def _call(handler, nodes):
+    pipe = handler.__self__
+    async_handler = getattr(pipe, "a" + handler.__name__, None)
+    if async_handler is not None:
+        return await async_handler(nodes)
+    if isinstance(pipe, NON_BLOCKING_PIPES) or getattr(pipe, "non_blocking", False):
+        return handler(nodes)
+    return await sync_to_async(handler)(nodes)
@@ -5,3 +5,14 @@ class DjediConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "djedi"
     verbose_name = "Djedi CMS"
+
+    def ready(self):
+        from . import state
+        from .auth import watch_permissions
+        from .esi import watch_published
+        from .utils.cache import watch_published_version
+
+        state.install()
+        watch_permissions()
+        watch_published()
+        watch_published_version()
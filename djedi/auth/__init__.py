@@ -1,7 +1,18 @@
 import logging
+import time
+
+import cio.conf
+
+from ..utils.cache import bump_counter, get_counter
 
 _log = logging.getLogger(__name__)
 
+PERMISSION_ATTR = "_djedi_permission"
+PERMISSION_SESSION_KEY = "djedi.permission"
+
+# Version of users and groups in the shared cache, bumped by any process changing permissions
+PERMISSION_VERSION_KEY = "djedi.permissions"
+
 
 def has_permission(request):
     user = getattr(request, "user", None)
@@ -9,8 +20,8 @@ def has_permission(request):
         if user.is_superuser:
             return True
 
-        if user.is_staff and user.groups.filter(name__iexact="djedi").exists():
-            return True
+        if user.is_staff:
+            return _has_group_permission(request, user)
     else:
         _log.warning(
             "Request does not have `user` attribute. Make sure that "
@@ -20,6 +31,67 @@ def has_permission(request):
     return False
 
 
+def _has_group_permission(request, user):
+    """
+    Check djedi group membership of staff user, memoized on the request,
+    and in the session for PERMISSION_TIMEOUT seconds.
+    """
+    memo = getattr(request, PERMISSION_ATTR, None)
+    if memo is None or memo[0] != str(user.pk):
+        session = getattr(request, "session", None)
+        memo = session.get(PERMISSION_SESSION_KEY) if session is not None else None
+        if not _is_valid_memo(memo, user):
+            timeout = cio.conf.settings.get("PERMISSION_TIMEOUT", 0)
+            memo = [
+                str(user.pk),
+                time.time(),
+                get_counter(PERMISSION_VERSION_KEY) if timeout else None,
+                user.groups.filter(name__iexact="djedi").exists(),
+            ]
+            if session is not None and timeout:
+                session[PERMISSION_SESSION_KEY] = memo
+        setattr(request, PERMISSION_ATTR, memo)
+
+    return memo[3]
+
+
+def _is_valid_memo(memo, user):
+    if not memo or len(memo) != 4:
+        return False
+
+    user_pk, checked_at, version, _ = memo
+    timeout = cio.conf.settings.get("PERMISSION_TIMEOUT", 0) or 0
+    return (
+        user_pk == str(user.pk)
+        and time.time() - checked_at < timeout
+        and version == get_counter(PERMISSION_VERSION_KEY)
+    )
+
+
+def invalidate_permissions(update_fields=None, **kwargs):
+    """
+    Invalidate memoized permissions on group, group membership or user changes.
+    """
+    # Ignore user logins
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+
+    bump_counter(PERMISSION_VERSION_KEY)
+
+
+def watch_permissions():
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.models import Group
+    from django.db.models.signals import m2m_changed, post_delete, post_save
+
+    user_model = get_user_model()
+    if hasattr(user_model, "groups"):
+        m2m_changed.connect(invalidate_permissions, sender=user_model.groups.through)
+    for signal in (post_save, post_delete):
+        signal.connect(invalidate_permissions, sender=Group)
+        signal.connect(invalidate_permissions, sender=user_model)
+
+
 def get_username(request):
     user = request.user
     if hasattr(user, "get_username"):
@@ -1,11 +1,147 @@
+import logging
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha1
+
+from asgiref.local import Local
+from asgiref.sync import sync_to_async
 from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.backends.base import BaseCache
 from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
 from django.utils.encoding import smart_bytes, smart_str
 
 from cio.backends.base import CacheBackend
+from cio.utils.uri import URI
+from djedi.signals import nodes_published
+
+from .stats import CacheStats, InstrumentedCache
+
+try:
+    import lz4.frame
+except ImportError:  # pragma: no cover
+    lz4 = None
+
+logger = logging.getLogger(__name__)
+
+# Binary cache value format, version byte followed by flags and length prefixed uri:
+#   <version:1><flags:1><uri length:2><uri><content, optionally compressed>
+VALUE_VERSION = b"\x01"
+VALUE_HEADER = struct.Struct(">cBH")
+FLAG_NONE = 0x01
+FLAG_ZLIB = 0x02
+FLAG_LZ4 = 0x04
+
+COMPRESSORS = {
+    "zlib": (FLAG_ZLIB, lambda data, level: zlib.compress(data, level)),
+    "lz4": (FLAG_LZ4, lambda data, level: lz4.frame.compress(data, level)),
+}
+
+
+class LocalCache:
+    """
+    Bounded per-process LRU cache with TTL eviction, used as L1 in front of the
+    shared django cache. Entries are dropped whenever the shared version changes.
+    """
+
+    def __init__(self, max_size=1024 * 1024, timeout=60, check_interval=1):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.version = None
+        self.checked_at = None
+        self._data = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def size(self):
+        return self._size
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        result = {}
+
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+
+                expires, value = entry
+                if expires is not None and expires <= now:
+                    self._pop(key)
+                else:
+                    self._data.move_to_end(key)
+                    result[key] = value
+
+        return result
+
+    def set_many(self, data):
+        expires = None
+        if self.timeout is not None:
+            expires = time.monotonic() + self.timeout
+
+        with self._lock:
+            for key, value in data.items():
+                self._pop(key)
+
+                size = self._sizeof(key, value)
+                if size > self.max_size:
+                    continue
+
+                self._data[key] = (expires, value)
+                self._size += size
+
+            # Evict least recently used entries until within size cap
+            while self._size > self.max_size:
+                key = next(iter(self._data))
+                self._pop(key)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def needs_check(self):
+        return (
+            self.checked_at is None
+            or time.monotonic() - self.checked_at >= self.check_interval
+        )
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._size -= self._sizeof(key, entry[1])
+
+    def _sizeof(self, key, value):
+        return len(key) + len(value)
+
+
+# Context value types with a reliable repr, safe to build render keys from
+SAFE_RENDER_TYPES = (str, int, float, type(None))
 
 
 class DjangoCacheBackend(CacheBackend):
+    VERSION_KEY = "djedi.version"
+    GENERATION_KEY = "djedi.generation"
+    LEASE_KEY = "djedi.lease"
+    REFRESH_KEY = "djedi.refresh"
+    NEGATIVE_KEY = "djedi.negative"
+
     def __init__(self, **config):
         """
         Get cache backend. Look for djedi specific cache first, then fallback on default
@@ -19,34 +155,691 @@ class DjangoCacheBackend(CacheBackend):
             from django.core.cache import cache
 
         self._cache = cache
+        self._generations = None
 
-    def clear(self):
-        self._cache.clear()
+        # Default async api of django caches hops to a thread per call, if any (django >= 4.0),
+        # prefer a single hop per batch unless natively implemented by the cache
+        base_aget_many = getattr(BaseCache, "aget_many", None)
+        self._native_async = (
+            base_aget_many is not None
+            and getattr(type(cache), "aget_many", base_aget_many) is not base_aget_many
+        )
+
+        # Collect per-process stats of all operations on the django cache
+        self.stats = None
+        if self.config.get("STATS"):
+            self.stats = CacheStats()
+            self._cache = InstrumentedCache(cache, self.stats)
+
+        # Node key timeout in seconds, None means forever
+        self.timeout = self.config.get("TIMEOUT")
+
+        generations_config = self.config.get("GENERATIONS")
+        if generations_config:
+            generations_config = (
+                {} if generations_config is True else generations_config
+            )
+            self._generations = {}
+            self._generations_checked_at = None
+            self._generations_interval = generations_config.get("CHECK_INTERVAL", 1)
+
+        # Encode values in compact binary format, optionally compressed above threshold
+        self._value_format = self.config.get("VALUE_FORMAT")
+        if self._value_format:
+            value_format = {} if self._value_format is True else self._value_format
+            compression = value_format.get("COMPRESSION", "zlib")
+            if compression not in (None, *COMPRESSORS):
+                raise ImproperlyConfigured(
+                    'Unknown cache value compression "%s"' % compression
+                )
+            if compression == "lz4" and lz4 is None:
+                raise ImproperlyConfigured("lz4 compression requires the lz4 package")
+
+            self._value_format = True
+            self._compression = compression
+            self._compression_threshold = value_format.get("THRESHOLD", 1024)
+            self._compression_level = value_format.get("LEVEL", 1)
+
+        self._local = self._build_local_cache(self.config.get("L1"))
+        self._renders = self._build_local_cache(self.config.get("RENDER_CACHE"))
+
+        # Let a single worker per missing key set fill the cache, while others wait
+        self._single_flight = self.config.get("SINGLE_FLIGHT")
+        if self._single_flight:
+            single_flight_config = (
+                {} if self._single_flight is True else self._single_flight
+            )
+            self._single_flight = True
+            self._lease_timeout = single_flight_config.get("LEASE_TIMEOUT", 5)
+            self._wait_timeout = single_flight_config.get("WAIT_TIMEOUT", 1)
+            self._poll_interval = single_flight_config.get("POLL_INTERVAL", 0.05)
+            self._leases = threading.local()
+
+        # Cache nodes missing in storage, i.e. defaults, with a separate timeout
+        self.negative_timeout = self.config.get("NEGATIVE_TIMEOUT")
+        if self.negative_timeout is not None:
+            # Per task on the event loop thread, generation of a get is used by its fill
+            self._negative = Local()
+            nodes_published.connect(self._bump_negative_generation)
+
+        # Serve entries past soft timeout while refreshing them in the background
+        self.soft_timeout = self.config.get("SOFT_TIMEOUT")
+        if self.soft_timeout is not None:
+            self._refresh_timeout = self.config.get("REFRESH_TIMEOUT", 30)
+            self._refresher = ThreadPoolExecutor(
+                max_workers=self.config.get("REFRESH_WORKERS", 1),
+                thread_name_prefix="djedi-refresh",
+            )
+            self._refreshing = threading.local()
+
+    def clear(self, namespace=None):
+        """
+        Remove all nodes, or only nodes within given uri namespace, e.g. "i18n://sv-se".
+        With generations enabled, nothing is deleted; the generation is bumped instead,
+        leaving old keys to expire and any non-djedi data in the cache untouched.
+        """
+        if self._generations is not None:
+            if namespace:
+                uri = URI(namespace if "@" in namespace else namespace + "@")
+                self._bump_generation(self._build_generation_key(uri))
+            else:
+                self._bump_generation(self.GENERATION_KEY)
+        elif namespace:
+            raise ImproperlyConfigured(
+                "Clearing a cache namespace requires the GENERATIONS cache option."
+            )
+        else:
+            self._cache.clear()
+
+        if self._local is not None:
+            self._local.clear()
+
+    def fill_many(self, nodes):
+        """
+        Cache nodes read from storage, like set_many, without invalidating local caches of other processes,
+        since filled content is already published.
+        No return.
+        """
+        self._set_many(self._prepare_nodes(nodes), invalidate=False)
+
+    async def afill_many(self, nodes):
+        await self.aset_many(nodes, invalidate=False)
+
+    async def aget_many(self, uris):
+        """
+        Async variant of get_many, through the async django cache api if natively implemented,
+        i.e. not by django's built-in caches, running their sync api in a thread per call.
+        Else, or if generations or single flight are enabled, get_many is run in a single thread hop.
+        """
+        if (
+            not self._native_async
+            or self._generations is not None
+            or self._single_flight
+        ):
+            return await sync_to_async(self.get_many)(uris)
+
+        cache_keys = {self._build_cache_key(uri): uri for uri in uris}
+        result = await self._aget_cached(list(cache_keys))
+
+        # Soft expiry is stripped even if disabled, values may be cached while it was enabled
+        stale = self._strip_soft_expiry(result)
+        if (
+            stale
+            and self.soft_timeout is not None
+            and await self._acache(
+                "add", self._build_refresh_key(stale), 1, timeout=self._refresh_timeout
+            )
+        ):
+            self._schedule_refresh(stale)
+
+        nodes = {}
+        for key, value in result.items():
+            uri = cache_keys[key]
+            node = self._decode_node(uri, value)
+            if node:
+                nodes[uri] = node
+        return nodes
+
+    async def aset_many(self, nodes, invalidate=True):
+        """
+        Async variant of set_many, through the async django cache api if natively implemented.
+        """
+        if (
+            not self._native_async
+            or self._generations is not None
+            or self._single_flight
+        ):
+            set_many = self.set_many if invalidate else self.fill_many
+            return await sync_to_async(set_many)(nodes)
+
+        data = self._prepare_nodes(nodes)
+
+        negative_keys = ()
+        if self.negative_timeout is not None:
+            negative_keys = [
+                key for key, value in data.items() if self._is_negative(value)
+            ]
+
+        if self.soft_timeout is not None:
+            data = self._set_soft_expiry(data)
+
+        if negative_keys:
+            generation = getattr(self._negative, "generation", None)
+            if generation is None:
+                generation = await self._aget_negative_generation()
+            data = self._set_negative_generation(data, negative_keys, generation)
+
+        for batch, timeout in self._batch_timeouts(data, negative_keys):
+            await self._acache("set_many", batch, timeout=timeout)
+        if invalidate:
+            self._drop_renders()
+        if self._local is not None:
+            if invalidate:
+                await self._abump_version()
+            self._local.set_many(data)
+
+    async def _acache(self, method, *args, **kwargs):
+        """
+        Call natively async django cache method.
+        """
+        return await getattr(self._cache, "a" + method)(*args, **kwargs)
+
+    def get_rendered(self, uri, content, context):
+        """
+        Return cached render output for node content and context, or None if not cached.
+        """
+        if self._renders is not None:
+            key = self._build_render_key(uri, content, context)
+            if key is not None:
+                output = self._renders.get_many([key]).get(key)
+                if output is not None:
+                    return smart_str(output)
+
+    def set_rendered(self, uri, content, context, output):
+        """
+        Cache render output for node content and context.
+        No return.
+        """
+        if self._renders is not None:
+            key = self._build_render_key(uri, content, context)
+            if key is not None:
+                self._renders.set_many({key: smart_bytes(output)})
+
+    def _build_render_key(self, uri, content, context):
+        """
+        Build render key from node uri, including version, and context. Content is only part of
+        the key of unversioned or draft nodes, i.e. defaults and nodes edited in place.
+        Returns None if context holds values that can't safely be part of a key.
+        """
+        if not all(isinstance(value, SAFE_RENDER_TYPES) for value in context.values()):
+            return None
+
+        parts = [str(uri)]
+        parts.extend(f"{name}={value!r}" for name, value in sorted(context.items()))
+        if not (uri.version or "").isdigit():
+            parts.append(f"{len(content)}:{content}")
+        return "\0".join(parts)
+
+    def _drop_renders(self):
+        # Render keys of published versions hold no content, drop renders of nodes updated in place
+        if self._renders is not None:
+            self._renders.clear()
+
+    def _build_local_cache(self, local_config):
+        if not local_config:
+            return None
+
+        local_config = {} if local_config is True else local_config
+        return LocalCache(**{key.lower(): value for key, value in local_config.items()})
 
     def _get(self, key):
-        return self._cache.get(key)
+        return self._get_many([key]).get(key)
 
     def _get_many(self, keys):
-        return self._cache.get_many(keys)
+        if self.soft_timeout is not None and getattr(self._refreshing, "stale", None):
+            # Bypass cache when refreshing stale entries
+            return {}
+
+        result = self._get_cached(keys)
+
+        if self.soft_timeout is not None:
+            result = self._check_soft_expiry(result)
+        else:
+            # Values may be cached while soft expiry was enabled
+            self._strip_soft_expiry(result)
+
+        if self._single_flight and self._fills_on_get():
+            missing = [key for key in keys if key not in result]
+            if missing and not self._acquire_lease(missing):
+                result.update(self._wait_for_fill(missing))
+
+        return result
+
+    def _get_cached(self, keys):
+        if self._local is None:
+            result = self._fetch(keys)
+        else:
+            self._check_version()
+
+            result = self._local.get_many(keys)
+            if self.stats is not None:
+                self.stats.incr(local_hits=len(result))
+            missing = [key for key in keys if key not in result]
+            if missing:
+                cached = self._fetch(missing)
+                self._local.set_many(cached)
+                result.update(cached)
+
+        return self._strip_negative(result)
+
+    async def _aget_cached(self, keys):
+        if self._local is None:
+            result = await self._afetch(keys)
+        else:
+            if self._local.needs_check():
+                self._checked_version(await self._acache("get", self.VERSION_KEY))
+
+            result = self._local.get_many(keys)
+            if self.stats is not None:
+                self.stats.incr(local_hits=len(result))
+            missing = [key for key in keys if key not in result]
+            if missing:
+                cached = await self._afetch(missing)
+                self._local.set_many(cached)
+                result.update(cached)
+
+        return self._strip_negative(result)
+
+    def _fetch(self, keys):
+        """
+        Get values from shared cache, dropping negative entries cached before last publish.
+        """
+        if self.negative_timeout is None:
+            result = self._cache.get_many(keys)
+        else:
+            result = self._cache.get_many(list(keys) + [self.NEGATIVE_KEY])
+
+        return self._fetched(keys, result)
+
+    async def _afetch(self, keys):
+        if self.negative_timeout is None:
+            result = await self._acache("get_many", keys)
+        else:
+            result = await self._acache("get_many", list(keys) + [self.NEGATIVE_KEY])
+
+        return self._fetched(keys, result)
+
+    def _fetched(self, keys, result):
+        if self.negative_timeout is not None:
+            generation = result.pop(self.NEGATIVE_KEY, None)
+            self._negative.generation = generation
+
+            prefix = b"~" + smart_bytes(generation) + b"\0"
+            result = {
+                key: value
+                for key, value in result.items()
+                if value[:1] != b"~" or value.startswith(prefix)
+            }
+
+        if self.stats is not None:
+            self.stats.incr(hits=len(result), misses=len(keys) - len(result))
+
+        return result
+
+    def _strip_negative(self, result):
+        # Stripped even if disabled, values may be cached while negative timeout was enabled
+        for key, value in result.items():
+            if value[:1] == b"~":
+                result[key] = value.partition(b"\0")[2]
+
+        return result
 
     def _set(self, key, value):
-        # TODO: Fix eternal timeout like viewlet
-        self._cache.set(key, value, timeout=None)
+        self._set_many({key: value})
+
+    def _set_many(self, data, invalidate=True):
+        negative_keys = ()
+        if self.negative_timeout is not None:
+            negative_keys = [
+                key for key, value in data.items() if self._is_negative(value)
+            ]
+
+        if self.soft_timeout is not None:
+            data = self._set_soft_expiry(data)
+
+        if negative_keys:
+            generation = getattr(self._negative, "generation", None)
+            if generation is None:
+                generation = self._get_negative_generation()
+            data = self._set_negative_generation(data, negative_keys, generation)
 
-    def _set_many(self, data):
-        # TODO: Fix eternal timeout like viewlet
-        self._cache.set_many(data, timeout=None)
+        for batch, timeout in self._batch_timeouts(data, negative_keys):
+            self._cache.set_many(batch, timeout=timeout)
+        if invalidate:
+            self._drop_renders()
+        if self._local is not None:
+            if invalidate:
+                self._bump_version()
+            self._local.set_many(data)
+        if self._single_flight:
+            self._release_leases(data)
 
     def _delete(self, key):
-        self._cache.delete(key)
+        self._delete_many([key])
 
     def _delete_many(self, keys):
+        keys = list(keys)
         self._cache.delete_many(keys)
+        self._drop_renders()
+        if self._local is not None:
+            self._bump_version()
+            self._local.delete_many(keys)
+
+    def _acquire_lease(self, keys):
+        """
+        Try to lease the right to fill given missing keys. Returns True if acquired.
+        """
+        lease_key = ".".join(
+            (self.LEASE_KEY, sha1(smart_bytes("|".join(sorted(keys)))).hexdigest())
+        )
+        if not self._cache.add(lease_key, 1, timeout=self._lease_timeout):
+            return False
+
+        # Forget expired leases never released, i.e. failed fills
+        now = time.monotonic()
+        leases = self._leases.__dict__.setdefault("keys", {})
+        for _lease_key, (_, expires_at) in list(leases.items()):
+            if expires_at <= now:
+                leases.pop(_lease_key)
+
+        leases[lease_key] = (set(keys), now + self._lease_timeout)
+        return True
+
+    def _release_leases(self, keys):
+        """
+        Release leases held by this thread, covering any of the given filled keys.
+        """
+        leases = self._leases.__dict__.get("keys")
+        if not leases:
+            return
+
+        released = [
+            lease_key
+            for lease_key, (lease_keys, _) in leases.items()
+            if not lease_keys.isdisjoint(keys)
+        ]
+        if released:
+            self._cache.delete_many(released)
+            for lease_key in released:
+                leases.pop(lease_key)
+
+    def _fills_on_get(self):
+        """
+        Check if the cache pipe fills misses on get, else nobody would release leases.
+        """
+        # Lazy import, the pipeline watches settings and is set up after backends
+        from djedi.pipeline import cache_on_get
+
+        return cache_on_get()
+
+    def _wait_for_fill(self, keys):
+        """
+        Poll cache for keys filled by lease holder until wait timeout.
+        Keys still missing are left for the caller to fill.
+        """
+        result = {}
+        missing = list(keys)
+        deadline = time.monotonic() + self._wait_timeout
+        while missing and time.monotonic() < deadline:
+            time.sleep(self._poll_interval)
+            result.update(self._get_cached(missing))
+            missing = [key for key in missing if key not in result]
+
+        return result
+
+    def _is_negative(self, value):
+        """
+        Check if value is a node missing in storage, cached without version.
+        """
+        return not URI(self._decode_uri(value)).version
+
+    def _get_negative_generation(self):
+        generation = self._cache.get(self.NEGATIVE_KEY)
+        if generation is None:
+            self._cache.add(self.NEGATIVE_KEY, int(time.time() * 1000), timeout=None)
+            generation = self._cache.get(self.NEGATIVE_KEY)
+        return generation
+
+    async def _aget_negative_generation(self):
+        generation = await self._acache("get", self.NEGATIVE_KEY)
+        if generation is None:
+            await self._acache(
+                "add", self.NEGATIVE_KEY, int(time.time() * 1000), timeout=None
+            )
+            generation = await self._acache("get", self.NEGATIVE_KEY)
+        return generation
+
+    def _set_negative_generation(self, data, keys, generation):
+        """
+        Prefix negative values with the publish generation seen when fetched.
+        """
+        data = dict(data)
+        for key in keys:
+            data[key] = b"~" + smart_bytes(generation) + b"\0" + data[key]
+        return data
+
+    def _batch_timeouts(self, data, negative_keys):
+        """
+        Split data in batches of negative and found entries, with their timeouts.
+        """
+        if not negative_keys:
+            return [(data, self.timeout)]
+
+        negative_data = {key: data[key] for key in negative_keys}
+        batches = [(negative_data, self.negative_timeout)]
+        if len(negative_data) < len(data):
+            batches.append(
+                (
+                    {
+                        key: value
+                        for key, value in data.items()
+                        if key not in negative_data
+                    },
+                    self.timeout,
+                )
+            )
+        return batches
+
+    def _bump_negative_generation(self, **kwargs):
+        """
+        Invalidate all negative entries, since published nodes may fill any of them, even as fallbacks.
+        """
+        try:
+            self._cache.incr(self.NEGATIVE_KEY)
+        except ValueError:
+            self._cache.add(self.NEGATIVE_KEY, int(time.time() * 1000), timeout=None)
+        if self._local is not None:
+            self._bump_version()
+
+    def _set_soft_expiry(self, data):
+        """
+        Prefix values with soft expiry timestamp, while keeping refreshed
+        entries not found in storage, e.g. cached defaults, as they were.
+        """
+        stale = getattr(self._refreshing, "stale", None) or {}
+        expires_at = smart_bytes("%d\0" % (time.time() + self.soft_timeout))
+        return {
+            key: expires_at
+            + (stale[key] if key in stale and self._is_none(value) else value)
+            for key, value in data.items()
+        }
+
+    def _check_soft_expiry(self, result):
+        """
+        Strip soft expiry from cached values and schedule refresh of stale ones.
+        """
+        stale = self._strip_soft_expiry(result)
+        if stale and self._cache.add(
+            self._build_refresh_key(stale), 1, timeout=self._refresh_timeout
+        ):
+            self._schedule_refresh(stale)
+
+        return result
+
+    def _strip_soft_expiry(self, result):
+        """
+        Strip soft expiry from cached values in place, returning stale ones.
+        """
+        now = time.time()
+        stale = {}
+        for key, value in result.items():
+            if value[:1].isdigit():
+                expires_at, _, value = value.partition(b"\0")
+                result[key] = value
+                if int(expires_at) <= now:
+                    stale[key] = value
+
+        return stale
+
+    def _schedule_refresh(self, stale):
+        # Lazy import, environment and pipeline watch settings and are set up after backends
+        from cio.environment import env
+
+        self._refresher.submit(self._refresh, stale, env.state)
+
+    def _build_refresh_key(self, keys):
+        return ".".join(
+            (self.REFRESH_KEY, sha1(smart_bytes("|".join(sorted(keys)))).hexdigest())
+        )
+
+    def _refresh(self, stale, state):
+        """
+        Refresh stale entries through the pipeline, bypassing cache reads, in given environment state.
+        """
+        from cio.environment import env
+        from cio.node import Node
+        from cio.pipeline import pipeline
+
+        self._refreshing.stale = stale
+        try:
+            with env(i18n=state.i18n, l10n=state.l10n, g11n=state.g11n):
+                uris = (URI(self._decode_uri(value)) for value in stale.values())
+                nodes = [Node(uri.clone(ext=None, version=None)) for uri in uris]
+                pipeline.send("get", *nodes)
+        except Exception:
+            logger.exception("Failed to refresh stale djedi cache entries")
+        finally:
+            self._refreshing.stale = None
+            self._cache.delete(self._build_refresh_key(stale))
+            # Pipeline history of this pool thread is never cleared by any request
+            pipeline.clear()
+            connections.close_all()
+
+    def _build_cache_key(self, uri):
+        """
+        Prefix sha1 key with global and namespace generations, if enabled.
+        """
+        key = super()._build_cache_key(uri)
+
+        if self._generations is not None:
+            generations = self._get_generations(
+                self.GENERATION_KEY, self._build_generation_key(uri)
+            )
+            key = ".".join([str(generation) for generation in generations] + [key])
+
+        return key
+
+    def _build_generation_key(self, uri):
+        namespace = uri.clone(path=None, ext=None, version=None)
+        return ".".join((self.GENERATION_KEY, sha1(smart_bytes(namespace)).hexdigest()))
+
+    def _get_generations(self, *keys):
+        # Swap in a new dict instead of clearing the one other threads may be reading
+        generations = self._generations
+        now = time.monotonic()
+        checked_at = self._generations_checked_at
+        if checked_at is None or now - checked_at >= self._generations_interval:
+            generations = self._generations = {}
+            self._generations_checked_at = now
+
+        found = {key: generations.get(key) for key in keys}
+        missing = [key for key, generation in found.items() if generation is None]
+        if missing:
+            fetched = self._cache.get_many(missing)
+            for key in missing:
+                if key not in fetched:
+                    fetched[key] = self._init_generation(key)
+            generations.update(fetched)
+            found.update(fetched)
+
+        return [found[key] for key in keys]
+
+    def _init_generation(self, key):
+        # Seed with current time to never reuse the value of an evicted generation
+        self._cache.add(key, int(time.time() * 1000), timeout=None)
+        return self._cache.get(key)
+
+    def _bump_generation(self, key):
+        try:
+            generation = self._cache.incr(key)
+        except ValueError:
+            self._init_generation(key)
+            generation = self._cache.incr(key)
+
+        self._generations[key] = generation
+
+    def _check_version(self):
+        """
+        Drop local entries if any process has written to the shared cache since last check.
+        """
+        if self._local.needs_check():
+            self._checked_version(self._cache.get(self.VERSION_KEY))
+
+    def _checked_version(self, version):
+        if version != self._local.version:
+            self._local.clear()
+            self._local.version = version
+        self._local.checked_at = time.monotonic()
+
+    def _bump_version(self):
+        """
+        Increment shared version to invalidate local caches in other processes.
+        """
+        try:
+            version = self._cache.incr(self.VERSION_KEY)
+        except ValueError:
+            self._cache.add(self.VERSION_KEY, 0, timeout=None)
+            version = self._cache.incr(self.VERSION_KEY)
+
+        self._bumped_version(version)
+
+    async def _abump_version(self):
+        try:
+            version = await self._acache("incr", self.VERSION_KEY)
+        except ValueError:
+            await self._acache("add", self.VERSION_KEY, 0, timeout=None)
+            version = await self._acache("incr", self.VERSION_KEY)
+
+        self._bumped_version(version)
+
+    def _bumped_version(self, version):
+        # Drop local entries if another process also wrote since our last check
+        if self._local.version is None or version != self._local.version + 1:
+            self._local.clear()
+
+        self._local.version = version
+        self._local.checked_at = time.monotonic()
 
     def _encode_content(self, uri, content):
         """
-        Join node uri and content as string and convert to bytes to ensure no pickling in memcached.
+        Join node uri and content as string and convert to bytes to ensure no pickling in memcached,
+        or pack them in the binary value format if enabled and content compresses.
         """
+        if self._value_format:
+            value = self._pack_content(uri, content)
+            if value is not None:
+                return value
+
         if content is None:
             content = self.NONE
         return smart_bytes("|".join([str(uri), content]))
@@ -55,12 +848,72 @@ class DjangoCacheBackend(CacheBackend):
         """
         Split node string to uri and content and convert back to unicode.
         """
+        if content[:1] == VALUE_VERSION:
+            return self._unpack_content(content)
+
         content = smart_str(content)
         uri, _, content = content.partition("|")
         if content == self.NONE:
             content = None
         return uri or None, content
 
+    def _pack_content(self, uri, content):
+        """
+        Pack uri and compressed content in the binary value format.
+        Returns None if content is below threshold or doesn't compress, leaving it as uri|content text,
+        since the binary format saves nothing on uncompressed content.
+        """
+        if content is None or not self._compression:
+            return None
+
+        content = smart_bytes(content)
+        if len(content) < self._compression_threshold:
+            return None
+
+        flags, compress = COMPRESSORS[self._compression]
+        data = compress(content, self._compression_level)
+        # Only keep compression that pays off, header included
+        if VALUE_HEADER.size + len(data) > len(content):
+            return None
+
+        uri = smart_bytes(uri)
+        return VALUE_HEADER.pack(VALUE_VERSION, flags, len(uri)) + uri + data
+
+    def _unpack_content(self, value):
+        _, flags, uri_length = VALUE_HEADER.unpack_from(value)
+        start, end = VALUE_HEADER.size, VALUE_HEADER.size + uri_length
+        uri = smart_str(value[start:end])
+        if flags & FLAG_NONE:
+            return uri or None, None
+
+        data = value[end:]
+        if flags & FLAG_ZLIB:
+            data = zlib.decompress(data)
+        elif flags & FLAG_LZ4:
+            if lz4 is None:
+                raise ImproperlyConfigured("lz4 compression requires the lz4 package")
+            data = lz4.frame.decompress(data)
+
+        return uri or None, smart_str(data)
+
+    def _decode_uri(self, value):
+        """
+        Decode only uri of encoded value, without decompressing content.
+        """
+        if value[:1] == VALUE_VERSION:
+            _, _, uri_length = VALUE_HEADER.unpack_from(value)
+            start, end = VALUE_HEADER.size, VALUE_HEADER.size + uri_length
+            return smart_str(value[start:end])
+        return smart_str(value.partition(b"|")[0])
+
+    def _is_none(self, value):
+        """
+        Check if encoded value has no content.
+        """
+        if value[:1] == VALUE_VERSION:
+            return bool(VALUE_HEADER.unpack_from(value)[1] & FLAG_NONE)
+        return value.endswith(smart_bytes("|" + self.NONE))
+
 
 class DebugLocMemCache(LocMemCache):
     def __init__(self, *args, **kwargs):
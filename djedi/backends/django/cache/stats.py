@@ -0,0 +1,215 @@
+import threading
+import time
+from functools import wraps
+
+# Latency histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, float("inf"))
+
+
+class CacheStats:
+    """
+    Thread safe per-process counters and latency histograms of cache operations.
+    Hits and misses count node lookups only, calls and latencies all operations.
+    """
+
+    COUNTERS = (
+        "calls",
+        "hits",
+        "misses",
+        "local_hits",
+        "sets",
+        "deletes",
+        "bytes_read",
+        "bytes_written",
+    )
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = dict.fromkeys(self.COUNTERS, 0)
+            self._latencies = {}
+
+    def incr(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                self._counters[name] += value
+
+    def record(self, operation, seconds, **counters):
+        """
+        Record call latency of operation together with counter increments.
+        """
+        milliseconds = seconds * 1000
+        bucket = next(
+            i for i, bound in enumerate(self.buckets) if milliseconds <= bound
+        )
+        with self._lock:
+            self._counters["calls"] += 1
+            for name, value in counters.items():
+                self._counters[name] += value
+
+            latency = self._latencies.get(operation)
+            if latency is None:
+                latency = self._latencies[operation] = {
+                    "count": 0,
+                    "sum": 0.0,
+                    "buckets": [0] * len(self.buckets),
+                }
+            latency["count"] += 1
+            latency["sum"] += milliseconds
+            latency["buckets"][bucket] += 1
+
+    def snapshot(self):
+        """
+        Return a copy of counters, hit rate and cumulative latency histograms in milliseconds:
+            {calls: x, hits: y, ..., hit_rate: z, latency: {get_many: {count, sum, buckets: {le: count}}}}
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = {
+                operation: dict(latency, buckets=list(latency["buckets"]))
+                for operation, latency in self._latencies.items()
+            }
+
+        lookups = counters["hits"] + counters["misses"] + counters["local_hits"]
+        counters["hit_rate"] = (
+            (counters["hits"] + counters["local_hits"]) / lookups if lookups else None
+        )
+
+        counters["latency"] = {}
+        for operation, latency in latencies.items():
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets, latency["buckets"]):
+                cumulative += count
+                buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+            counters["latency"][operation] = {
+                "count": latency["count"],
+                "sum": round(latency["sum"], 3),
+                "buckets": buckets,
+            }
+
+        return counters
+
+
+def _timed(method):
+    """
+    Record latency of proxied cache method, and counters returned along with its result.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        started_at = time.perf_counter()
+        result, counters = method(self, *args, **kwargs)
+        self.stats.record(method.__name__, time.perf_counter() - started_at, **counters)
+        return result
+
+    return wrapper
+
+
+def _atimed(method):
+    """
+    Async variant of _timed.
+    """
+
+    @wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        started_at = time.perf_counter()
+        result, counters = await method(self, *args, **kwargs)
+        self.stats.record(method.__name__, time.perf_counter() - started_at, **counters)
+        return result
+
+    return wrapper
+
+
+def _size(value):
+    return len(value) if isinstance(value, (bytes, str)) else 0
+
+
+class InstrumentedCache:
+    """
+    Proxy of a django cache, recording stats of all operations.
+    """
+
+    def __init__(self, cache, stats):
+        self._cache = cache
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+    @_timed
+    def get(self, key, *args, **kwargs):
+        value = self._cache.get(key, *args, **kwargs)
+        return value, {"bytes_read": _size(value)}
+
+    @_timed
+    def get_many(self, keys, *args, **kwargs):
+        result = self._cache.get_many(keys, *args, **kwargs)
+        return result, {"bytes_read": sum(_size(value) for value in result.values())}
+
+    @_timed
+    def set(self, key, value, *args, **kwargs):
+        return self._cache.set(key, value, *args, **kwargs), {
+            "sets": 1,
+            "bytes_written": _size(value),
+        }
+
+    @_timed
+    def set_many(self, data, *args, **kwargs):
+        return self._cache.set_many(data, *args, **kwargs), {
+            "sets": len(data),
+            "bytes_written": sum(_size(value) for value in data.values()),
+        }
+
+    @_timed
+    def add(self, key, value, *args, **kwargs):
+        return self._cache.add(key, value, *args, **kwargs), {
+            "bytes_written": _size(value)
+        }
+
+    @_timed
+    def incr(self, key, *args, **kwargs):
+        return self._cache.incr(key, *args, **kwargs), {}
+
+    @_timed
+    def delete(self, key, *args, **kwargs):
+        return self._cache.delete(key, *args, **kwargs), {"deletes": 1}
+
+    @_timed
+    def delete_many(self, keys, *args, **kwargs):
+        keys = list(keys)
+        return self._cache.delete_many(keys, *args, **kwargs), {"deletes": len(keys)}
+
+    @_timed
+    def clear(self):
+        return self._cache.clear(), {}
+
+    @_atimed
+    async def aget(self, key, *args, **kwargs):
+        value = await self._cache.aget(key, *args, **kwargs)
+        return value, {"bytes_read": _size(value)}
+
+    @_atimed
+    async def aget_many(self, keys, *args, **kwargs):
+        result = await self._cache.aget_many(keys, *args, **kwargs)
+        return result, {"bytes_read": sum(_size(value) for value in result.values())}
+
+    @_atimed
+    async def aset_many(self, data, *args, **kwargs):
+        return await self._cache.aset_many(data, *args, **kwargs), {
+            "sets": len(data),
+            "bytes_written": sum(_size(value) for value in data.values()),
+        }
+
+    @_atimed
+    async def aadd(self, key, value, *args, **kwargs):
+        return await self._cache.aadd(key, value, *args, **kwargs), {
+            "bytes_written": _size(value)
+        }
+
+    @_atimed
+    async def aincr(self, key, *args, **kwargs):
+        return await self._cache.aincr(key, *args, **kwargs), {}
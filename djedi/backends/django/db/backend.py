@@ -1,12 +1,19 @@
 import logging
+from collections import defaultdict
+from itertools import chain
 
-from django.db import IntegrityError
+import django
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Q, Value
 
 from cio.backends.base import DatabaseBackend
 from cio.backends.exceptions import NodeDoesNotExist, PersistenceError
+from cio.utils.uri import URI
 
 # Use absolute import here or Django 1.7 complains about duplicate models.
-from djedi.backends.django.db.models import Node
+from djedi.backends.django.db.models import Node, PublishedNode
+from djedi.signals import nodes_published
 
 logger = logging.getLogger(__name__)
 
@@ -17,31 +24,66 @@ class DjangoModelStorageBackend(DatabaseBackend):
     def __init__(self, **config):
         super().__init__(**config)
 
+        # Read published nodes from denormalized table instead of revision history
+        self.published_nodes = bool(self.config.get("PUBLISHED_NODES", False))
+
+        # Render published content once at publish time instead of on every read
+        self.prerender = bool(self.config.get("PRERENDER", False))
+
     def get_many(self, uris):
-        storage_keys = {self._build_key(uri): uri for uri in uris}
-        stored_nodes = Node.objects.filter(key__in=storage_keys.keys())
-        stored_nodes = stored_nodes.values_list(
-            "key", "content", "plugin", "version", "is_published", "meta"
-        )
+        storage_keys = self._build_storage_keys(uris)
+        if not storage_keys:
+            return {}
+
+        stored_nodes = chain.from_iterable(self._query_stored_nodes(storage_keys))
+        return self._match_stored_nodes(storage_keys, stored_nodes)
+
+    async def aget_many(self, uris):
+        """
+        Async variant of get_many, through the async ORM on django >= 4.1, else in a thread.
+        """
+        if django.VERSION < (4, 1):
+            return await sync_to_async(self.get_many)(uris)
+
+        storage_keys = self._build_storage_keys(uris)
+        if not storage_keys:
+            return {}
+
+        stored_nodes = [
+            row
+            for queryset in self._query_stored_nodes(storage_keys)
+            async for row in queryset
+        ]
+        return self._match_stored_nodes(storage_keys, stored_nodes)
 
-        # Filter matching nodes
+    def _build_storage_keys(self, uris):
+        storage_keys = defaultdict(list)
+        for uri in uris:
+            storage_keys[self._build_key(uri)].append(uri)
+        return storage_keys
+
+    def _match_stored_nodes(self, storage_keys, stored_nodes):
+        """
+        Filter stored node rows matching requested uris.
+        """
         nodes = {}
-        for key, content, plugin, version, is_published, meta in stored_nodes:
-            uri = storage_keys[key]
-
-            # Assert requested plugin matches
-            if uri.ext in (None, plugin):
-                # Assert version matches or node is published
-                if (uri.version == version) or (is_published and not uri.version):
-                    meta = self._decode_meta(meta, is_published=is_published)
-                    nodes[uri] = {
-                        "uri": uri.clone(ext=plugin, version=version),
-                        "content": content,
-                        "meta": meta,
-                    }
+        for key, content, plugin, version, is_published, meta, rendered in stored_nodes:
+            for uri in storage_keys[key]:
+                # Assert requested plugin matches
+                if uri.ext in (None, plugin):
+                    # Assert version matches or node is published
+                    if (uri.version == version) or (is_published and not uri.version):
+                        nodes[uri] = {
+                            "uri": uri.clone(ext=plugin, version=version),
+                            "content": content,
+                            "meta": self._decode_meta(
+                                meta, is_published=is_published, rendered=rendered
+                            ),
+                        }
 
         return nodes
 
+    @transaction.atomic
     def publish(self, uri, **meta):
         node = self._get(uri)
 
@@ -60,10 +102,126 @@ class DjangoModelStorageBackend(DatabaseBackend):
             # Publish this version
             self._update_meta(node, meta)
             node.is_published = True
+            node.rendered = self._render(node)
             node.save()
+            self._sync_published(node)
+            self._send_published(node)
 
         return self._serialize(uri, node)
 
+    @transaction.atomic
+    def set_many(self, nodes, **meta):
+        """
+        Persist many nodes, {uri: content, ...}, with a constant number of queries.
+        Return request uri map of node dicts:
+            {requested_uri: {uri: x, content: y, meta: {}}}
+        """
+        stored_nodes = Node.objects.filter(
+            key__in={self._build_key(uri) for uri in nodes},
+            version__in={uri.version for uri in nodes},
+        )
+        stored_nodes = {
+            (node.key, node.plugin, node.version): node for node in stored_nodes
+        }
+
+        created_nodes, updated_nodes, result = [], [], {}
+        for uri, content in nodes.items():
+            node = stored_nodes.get((self._build_key(uri), uri.ext, uri.version))
+            if node is None:
+                node = Node(
+                    key=self._build_key(uri),
+                    content=content,
+                    plugin=uri.ext,
+                    version=uri.version,
+                    is_published=False,
+                    meta=self._encode_meta(meta),
+                )
+                created_nodes.append(node)
+            else:
+                self._update_meta(node, meta)
+                node.content = content
+                node.rendered = self._render(node)
+                updated_nodes.append(node)
+            result[uri] = node
+
+        try:
+            Node.objects.bulk_create(created_nodes)
+        except IntegrityError as e:
+            raise PersistenceError(f"Failed to create nodes; {e}")
+        Node.objects.bulk_update(updated_nodes, ["content", "meta", "rendered"])
+        published_nodes = [node for node in updated_nodes if node.is_published]
+        self._sync_published(*published_nodes)
+        if published_nodes:
+            self._send_published(*published_nodes)
+
+        return {uri: self._serialize(uri, node) for uri, node in result.items()}
+
+    @transaction.atomic
+    def publish_many(self, uris, **meta):
+        """
+        Publish many versioned uris with a constant number of queries.
+        Return request uri map of published node dicts, skipping non-existing nodes:
+            {requested_uri: {uri: x, content: y, meta: {}}}
+        """
+        # Match requested versions against light revision rows, then load only matched nodes in full
+        revisions = defaultdict(list)
+        for revision in Node.objects.filter(
+            key__in={self._build_key(uri) for uri in uris}
+        ).only("key", "plugin", "version", "is_published"):
+            revisions[revision.key].append(revision)
+
+        matched = {}
+        for uri in uris:
+            revision = next(
+                (
+                    revision
+                    for revision in revisions[self._build_key(uri)]
+                    if self._matches(revision, uri)
+                ),
+                None,
+            )
+            if revision is not None:
+                matched[uri] = revision
+        nodes = Node.objects.in_bulk({revision.pk for revision in matched.values()})
+
+        published_nodes, publishing, result = [], {}, {}
+        for uri, revision in matched.items():
+            node = nodes[revision.pk]
+
+            if not node.is_published:
+                # Assign version number
+                if not node.version.isdigit():
+                    node.version = revision.version = self._get_next_version(
+                        other.version for other in revisions[node.key]
+                    )
+
+                # Un publish any other revision published in this batch
+                previous = publishing.get(node.key)
+                if previous is not None:
+                    previous.is_published = False
+
+                # Publish this version
+                self._update_meta(node, meta)
+                node.is_published = True
+                node.rendered = self._render(node)
+                published_nodes.append(node)
+                publishing[node.key] = node
+
+            result[uri] = node
+
+        if published_nodes:
+            Node.objects.filter(
+                key__in={node.key for node in published_nodes}, is_published=True
+            ).update(is_published=False)
+            Node.objects.bulk_update(
+                published_nodes, ["version", "meta", "is_published", "rendered"]
+            )
+            published_nodes = [node for node in published_nodes if node.is_published]
+            self._sync_published(*published_nodes)
+            self._send_published(*published_nodes)
+
+        return {uri: self._serialize(uri, node) for uri, node in result.items()}
+
     def get_revisions(self, uri):
         key = self._build_key(uri)
         nodes = Node.objects.filter(key=key).order_by("date_created")
@@ -73,6 +231,27 @@ class DjangoModelStorageBackend(DatabaseBackend):
             for plugin, version, is_published in revisions
         ]
 
+    def get_revisions_many(self, uris):
+        """
+        Return request uri map of revision lists using a single query:
+            {requested_uri: [('i18n://sv-se@page/title.txt#1', False), ...]}
+        """
+        keys = {uri: self._build_key(uri) for uri in uris}
+        nodes = Node.objects.filter(key__in=set(keys.values())).order_by("date_created")
+        revisions = defaultdict(list)
+        for key, plugin, version, is_published in nodes.values_list(
+            "key", "plugin", "version", "is_published"
+        ):
+            revisions[key].append((plugin, version, is_published))
+
+        return {
+            uri: [
+                (key.clone(ext=plugin, version=version), is_published)
+                for plugin, version, is_published in revisions[key]
+            ]
+            for uri, key in keys.items()
+        }
+
     def _get(self, uri):
         key = self._build_key(uri)
         nodes = Node.objects.filter(key=key)
@@ -111,20 +290,150 @@ class DjangoModelStorageBackend(DatabaseBackend):
         node.content = content
         node.plugin = uri.ext
         node.version = uri.version
+        node.rendered = self._render(node)
         node.save()
 
+        if node.is_published:
+            self._sync_published(node)
+            self._send_published(node)
+
         return node
 
     def _delete(self, node):
         node.delete()
 
+        if node.is_published:
+            if self.published_nodes:
+                PublishedNode.objects.filter(key=node.key).delete()
+            self._send_published(node)
+
+    def _query_stored_nodes(self, storage_keys):
+        """
+        Only query published or exactly versioned rows, not whole revision history.
+        Returns list of lazy querysets of node rows.
+        """
+        published_keys = set()
+        query = Q()
+        for key, uris in storage_keys.items():
+            for uri in uris:
+                if uri.version:
+                    query |= Q(key=key, version=uri.version)
+                else:
+                    published_keys.add(key)
+
+        stored_nodes = []
+        if published_keys:
+            if self.published_nodes:
+                stored_nodes.append(self._get_published_many(published_keys))
+            else:
+                query |= Q(key__in=published_keys, is_published=True)
+        if query:
+            stored_nodes.append(
+                Node.objects.filter(query).values_list(
+                    "key",
+                    "content",
+                    "plugin",
+                    "version",
+                    "is_published",
+                    "meta",
+                    "rendered",
+                )
+            )
+
+        return stored_nodes
+
+    def _get_published_many(self, keys):
+        published_nodes = PublishedNode.objects.filter(key__in=keys)
+        published_nodes = published_nodes.annotate(
+            is_published=Value(True, output_field=BooleanField())
+        )
+        return published_nodes.values_list(
+            "key", "content", "plugin", "version", "is_published", "meta", "rendered"
+        )
+
+    def _sync_published(self, *nodes):
+        """
+        Mirror published node revisions to the denormalized published nodes table.
+        """
+        if not self.published_nodes or not nodes:
+            return
+
+        PublishedNode.objects.filter(key__in=[node.key for node in nodes]).delete()
+        PublishedNode.objects.bulk_create(
+            [
+                PublishedNode(
+                    key=node.key,
+                    content=node.content,
+                    plugin=node.plugin,
+                    version=node.version,
+                    meta=node.meta,
+                    rendered=node.rendered,
+                )
+                for node in nodes
+            ]
+        )
+
+    def _send_published(self, *nodes):
+        """
+        Signal published nodes when committed.
+        """
+        uris = [
+            URI(node.key).clone(ext=node.plugin, version=node.version) for node in nodes
+        ]
+        transaction.on_commit(
+            lambda: nodes_published.send(sender=self.__class__, uris=uris)
+        )
+
+    def _render(self, node):
+        """
+        Render published node content with its plugin when prerendering is enabled.
+        Returns None for drafts, leaving them to be rendered on read.
+        """
+        if not self.prerender or not node.is_published:
+            return None
+
+        # Lazy import, plugin library watches settings and backends are set up by settings callbacks
+        from cio.plugins import plugins
+        from cio.plugins.exceptions import UnknownPlugin
+
+        try:
+            plugin = plugins.get(node.plugin)
+        except UnknownPlugin:
+            return None
+
+        return plugin.render(plugin.load(node.content))
+
+    def _matches(self, node, uri):
+        """
+        Check if stored node matches uri plugin and version, or published state if unversioned.
+        """
+        if uri.ext not in (None, node.plugin):
+            return False
+        if uri.version:
+            return node.version == uri.version
+        return node.is_published
+
     def _serialize(self, uri, node):
-        meta = self._decode_meta(node.meta, is_published=node.is_published)
+        meta = self._decode_meta(
+            node.meta, is_published=node.is_published, rendered=node.rendered
+        )
         return {
             "uri": uri.clone(ext=node.plugin, version=node.version),
             "content": node.content,
             "meta": meta,
         }
 
+    def _encode_meta(self, meta):
+        # Rendered content is persisted in its own column, never as meta
+        if meta and "rendered" in meta:
+            meta = {key: value for key, value in meta.items() if key != "rendered"}
+        return super()._encode_meta(meta)
+
+    def _decode_meta(self, meta, rendered=None, **extra):
+        meta = super()._decode_meta(meta, **extra)
+        if rendered is not None:
+            meta["rendered"] = rendered
+        return meta
+
     def _update_meta(self, node, meta):
         node.meta = self._merge_meta(node.meta, meta)
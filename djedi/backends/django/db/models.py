@@ -8,7 +8,27 @@ class Node(models.Model):
     version = models.CharField(max_length=255)
     is_published = models.BooleanField(default=False, blank=True)
     meta = models.TextField(blank=True, null=True)
+    rendered = models.TextField(blank=True, null=True)
     date_created = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = "djedi_node"
+        indexes = [
+            models.Index(fields=["key", "is_published"], name="djedi_node_key_pub_idx"),
+        ]
+
+
+class PublishedNode(models.Model):
+    """
+    Denormalized copy of the published revision of each node key.
+    """
+
+    key = models.CharField(max_length=255, primary_key=True)
+    content = models.TextField(blank=True)
+    plugin = models.CharField(max_length=8)
+    version = models.CharField(max_length=255)
+    meta = models.TextField(blank=True, null=True)
+    rendered = models.TextField(blank=True, null=True)
+
+    class Meta:
+        db_table = "djedi_published_node"
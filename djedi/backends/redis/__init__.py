@@ -0,0 +1,5 @@
+from .backend import RedisCacheBackend
+
+
+class Backend(RedisCacheBackend):
+    pass
@@ -0,0 +1,245 @@
+import os
+import re
+import threading
+import uuid
+import weakref
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.encoding import smart_bytes, smart_str
+from django.utils.module_loading import import_string
+
+from cio.backends.base import CacheBackend
+from cio.utils.uri import URI
+from djedi.backends.django.cache.backend import LocalCache
+
+try:
+    import redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Redis cache backend batching round trips with pipelines, namespacing keys
+    per uri namespace and invalidating per-process L1 caches through pub/sub.
+    """
+
+    def __init__(self, **config):
+        super().__init__(**config)
+
+        client_class = self.config.get("CLIENT_CLASS", "redis.Redis")
+        if client_class == "redis.Redis" and redis is None:
+            raise ImproperlyConfigured(
+                "The redis cache backend requires the redis package"
+            )
+
+        url = self.config.get("URL", "redis://localhost:6379/0")
+        self._client = import_string(client_class).from_url(url)
+
+        self.prefix = self.config.get("PREFIX", "djedi")
+        self.channel = self.config.get("CHANNEL", "%s:invalidate" % self.prefix)
+
+        # Node key timeout in seconds, None means forever
+        self.timeout = self.config.get("TIMEOUT")
+
+        # Identify own invalidation messages
+        self._origin = smart_bytes(uuid.uuid4().hex)
+
+        self._local = None
+        self._subscriber = None
+        self._subscriber_pid = None
+        local_config = self.config.get("L1")
+        if local_config:
+            local_config = {} if local_config is True else local_config
+            self._local = LocalCache(
+                **{key.lower(): value for key, value in local_config.items()}
+            )
+            self._subscribe_lock = threading.Lock()
+
+    def clear(self, namespace=None):
+        """
+        Remove all nodes, or nodes within uri namespace, e.g. i18n://sv-se, by key prefix.
+        No return.
+        """
+        if namespace is None:
+            pattern = self._escape(self.prefix) + ":*"
+        else:
+            uri = URI(namespace if "@" in namespace else namespace + "@")
+            pattern = ":".join(
+                self._escape(part) for part in (self.prefix, uri.scheme, uri.namespace)
+            )
+            pattern += ":*"
+
+        keys = []
+        for key in self._client.scan_iter(match=pattern, count=1000):
+            keys.append(key)
+            if len(keys) >= 1000:
+                self._client.delete(*keys)
+                keys = []
+        if keys:
+            self._client.delete(*keys)
+
+        if self._local is not None:
+            self._subscribe()
+            self._client.publish(self.channel, self._origin + b" *")
+            self._local.clear()
+
+    def fill_many(self, nodes):
+        """
+        Cache nodes read from storage, like set_many, without invalidating local caches of other processes.
+        No return.
+        """
+        self._set_many(self._prepare_nodes(nodes), invalidate=False)
+
+    def close(self):
+        """
+        Stop listening for invalidations, in this process for good.
+        """
+        if self._subscriber is not None:
+            self._stop_subscriber()
+            self._subscriber = None
+        self._subscriber_pid = os.getpid()
+
+    def _build_cache_key(self, uri):
+        """
+        Prefix sha1 key with uri scheme and namespace, to support invalidation by prefix.
+        """
+        key = super()._build_cache_key(uri)
+        return ":".join((self.prefix, uri.scheme or "", uri.namespace or "", key))
+
+    def _get(self, key):
+        return self._get_many([key]).get(key)
+
+    def _get_many(self, keys):
+        keys = list(keys)
+        result = {}
+        if self._local is not None:
+            self._subscribe()
+            result = self._local.get_many(keys)
+            keys = [key for key in keys if key not in result]
+
+        if keys:
+            cached = {
+                key: value
+                for key, value in zip(keys, self._client.mget(keys))
+                if value is not None
+            }
+            if self._local is not None:
+                self._local.set_many(cached)
+            result.update(cached)
+
+        return result
+
+    def _set(self, key, value):
+        self._set_many({key: value})
+
+    def _set_many(self, data, invalidate=True):
+        if not data:
+            return
+
+        if self._local is not None:
+            self._subscribe()
+
+        pipeline = self._client.pipeline(transaction=False)
+        for key, value in data.items():
+            pipeline.set(key, value, ex=self.timeout)
+        if invalidate:
+            self._publish_invalidation(pipeline, data.keys())
+        pipeline.execute()
+
+        if self._local is not None:
+            self._local.set_many(data)
+
+    def _delete(self, key):
+        self._delete_many([key])
+
+    def _delete_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+
+        if self._local is not None:
+            self._subscribe()
+
+        pipeline = self._client.pipeline(transaction=False)
+        pipeline.delete(*keys)
+        self._publish_invalidation(pipeline, keys)
+        pipeline.execute()
+
+        if self._local is not None:
+            self._local.delete_many(keys)
+
+    def _publish_invalidation(self, pipeline, keys):
+        # Only processes with L1 have anything to invalidate
+        if self._local is not None:
+            pipeline.publish(
+                self.channel, self._origin + b" " + smart_bytes(" ".join(keys))
+            )
+
+    def _subscribe(self):
+        """
+        Listen for invalidations in a thread, started on first use in each process, since threads
+        started at django setup don't survive forks of preforking servers. Stopped on close, or when
+        this backend is dropped, e.g. replaced by content-io on settings change.
+        """
+        pid = os.getpid()
+        if self._subscriber_pid == pid:
+            return
+
+        with self._subscribe_lock:
+            if self._subscriber_pid == pid:
+                return
+
+            if self._subscriber is not None:
+                # Inherited from parent process, without its thread
+                self._stop_subscriber.detach()
+
+            backend = weakref.ref(self)
+
+            def invalidate(message):
+                _backend = backend()
+                if _backend is not None:
+                    _backend._invalidate(message)
+
+            pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: invalidate})
+            self._subscriber = pubsub.run_in_thread(sleep_time=1, daemon=True)
+            self._stop_subscriber = weakref.finalize(self, self._subscriber.stop)
+
+            # Entries cached before subscribing may have missed invalidations
+            self._local.clear()
+            self._subscriber_pid = pid
+
+    def _invalidate(self, message):
+        """
+        Drop local entries changed by other processes.
+        """
+        origin, _, keys = message["data"].partition(b" ")
+        if origin == self._origin:
+            return
+
+        if keys == b"*":
+            self._local.clear()
+        else:
+            self._local.delete_many(smart_str(keys).split())
+
+    def _escape(self, pattern):
+        return re.sub(r"([*?\[\]\\])", r"\\\1", pattern)
+
+    def _encode_content(self, uri, content):
+        """
+        Join node uri and content as string and convert to bytes.
+        """
+        if content is None:
+            content = self.NONE
+        return smart_bytes("|".join([str(uri), content]))
+
+    def _decode_content(self, content):
+        """
+        Split node string to uri and content and convert back to unicode.
+        """
+        content = smart_str(content)
+        uri, _, content = content.partition("|")
+        if content == self.NONE:
+            content = None
+        return uri or None, content
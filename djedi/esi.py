@@ -0,0 +1,159 @@
+"""
+Edge Side Includes output mode, rendering node tags as ``<esi:include>`` of signed fragment urls,
+letting pages with djedi content be cached at the edge, e.g. by Varnish or a CDN.
+"""
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request, urlopen
+
+from django.core.signing import Signer
+from django.db import transaction
+from django.urls import reverse
+
+import cio
+import cio.conf
+from cio.utils.uri import URI
+
+from .auth import has_permission
+from .utils.cache import get_shared_cache
+
+_log = logging.getLogger(__name__)
+
+SALT = "djedi.esi"
+DEFAULT_KEY_PREFIX = "djedi.esi.default:"
+
+# Seconds between re-adding a default to the shared cache, in case it was evicted
+DEFAULT_REFRESH_INTERVAL = 60 * 60
+
+# Keys of defaults added to the shared cache by this process, and when
+_stored_defaults = {}
+
+# Purge requests are sent in the background, in order, not blocking publishing requests
+_purger = ThreadPoolExecutor(max_workers=1, thread_name_prefix="djedi-purge")
+
+
+def get_config():
+    config = cio.conf.settings.get("ESI")
+    if not config:
+        return None
+    return {} if config is True else config
+
+
+def is_enabled(context):
+    """
+    Render node tags as edge side includes, unless disabled, rendered for a djedi editor
+    or rendered without request, e.g. for emails.
+    """
+    if not cio.conf.settings.get("ESI"):
+        return False
+
+    # Editors need nodes inlined, and part of the request pipeline history, for the admin panel
+    request = context.get("request")
+    return request is not None and not has_permission(request)
+
+
+def store_default(default):
+    """
+    Store default in the shared cache, at most once per refresh interval and process,
+    returning its content addressed key, or None for empty defaults.
+    """
+    if not default:
+        return None
+
+    key = hashlib.sha1(default.encode()).hexdigest()
+    now = time.monotonic()
+    stored_at = _stored_defaults.get(key)
+    if stored_at is None or now - stored_at > DEFAULT_REFRESH_INTERVAL:
+        get_shared_cache().add(DEFAULT_KEY_PREFIX + key, default, timeout=None)
+        _stored_defaults[key] = now
+    return key
+
+
+def load_default(key):
+    """
+    Load default by key, returning None and False if evicted from the shared cache.
+    """
+    if key is None:
+        return None, True
+
+    default = get_shared_cache().get(DEFAULT_KEY_PREFIX + key)
+    return default, default is not None
+
+
+def dumps(uri, default, edit):
+    """
+    Sign node uri, key of default and current environment into a deterministic fragment token,
+    keeping urls short for block nodes with large defaults.
+    """
+    env = cio.env.state
+    return Signer(salt=SALT).sign_object(
+        [
+            str(uri),
+            store_default(default),
+            edit,
+            list(env.i18n),
+            list(env.l10n),
+            list(env.g11n),
+        ]
+    )
+
+
+def loads(token):
+    """
+    Load uri, default key, edit and environment of fragment token, raising BadSignature if tampered with.
+    """
+    uri, default_key, edit, i18n, l10n, g11n = Signer(salt=SALT).unsign_object(token)
+    return uri, default_key, edit, {"i18n": i18n, "l10n": l10n, "g11n": g11n}
+
+
+def render_include(uri, default, edit):
+    src = reverse("admin:djedi:rest:fragment", args=[dumps(uri, default, edit)])
+    return f'<esi:include src="{src}" />'
+
+
+def surrogate_key(uri):
+    """
+    Cache key of fragments for uri, shared by all namespaces, extensions and versions of it.
+    """
+    uri = URI(uri)
+    uri = "%s://%s" % (uri.scheme or cio.conf.settings.URI_DEFAULT_SCHEME, uri.path)
+    return "djedi-" + hashlib.sha1(uri.encode()).hexdigest()[:16]
+
+
+def purge(uris):
+    """
+    Purge fragments of uris from edge caches, by surrogate key, blocking for up to
+    PURGE_TIMEOUT seconds per purge url.
+    """
+    config = get_config()
+    if not config or not config.get("PURGE_URLS"):
+        return
+
+    keys = " ".join(sorted({surrogate_key(uri) for uri in uris}))
+    headers = {config.get("KEY_HEADER", "Surrogate-Key"): keys}
+    for url in config["PURGE_URLS"]:
+        try:
+            urlopen(
+                Request(url, method="PURGE", headers=headers),
+                timeout=config.get("PURGE_TIMEOUT", 1),
+            ).close()
+        except OSError:
+            _log.exception("Failed to purge djedi fragments at %s", url)
+
+
+def purge_published(sender, uris, **kwargs):
+    config = get_config()
+    if config and config.get("PURGE_URLS"):
+        # Purge once committed, edge caches would otherwise refetch and cache old content
+        transaction.on_commit(lambda: _purger.submit(purge, uris))
+
+
+def watch_published():
+    """
+    Purge fragments of nodes on publish, in the background.
+    """
+    from .signals import nodes_published
+
+    nodes_published.connect(purge_published, dispatch_uid="djedi.esi.purge_published")
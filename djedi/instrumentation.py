@@ -0,0 +1,171 @@
+"""
+Opt-in per-request instrumentation of pipeline flushes, cache and storage lookups and plugin renders.
+"""
+import logging
+import time
+import warnings
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+_recorder = ContextVar("djedi_recorder", default=None)
+_origin = ContextVar("djedi_origin", default=None)
+
+
+class TooManyRoundTrips(Exception):
+    pass
+
+
+class RoundTripWarning(RuntimeWarning):
+    pass
+
+
+class Recorder:
+    """
+    Counts and total durations of djedi operations within a request.
+    """
+
+    OPERATIONS = ("flush", "cache", "storage", "render")
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.counts = dict.fromkeys(self.OPERATIONS, 0)
+        self.durations = dict.fromkeys(self.OPERATIONS, 0.0)
+        self.flush_origins = []
+
+    def record(self, operation, seconds=0.0, count=1):
+        self.counts[operation] += count
+        self.durations[operation] += seconds
+        if self.parent is not None:
+            self.parent.record(operation, seconds, count)
+
+    def record_flush(self, origin=None):
+        self.flush_origins.append(origin)
+        self.counts["flush"] += 1
+        if self.parent is not None:
+            self.parent.record_flush(origin)
+
+    def check_round_trips(self, limit, raise_error=False):
+        """
+        Warn, or raise, if nodes were resolved in more pipeline flushes than limit,
+        reporting the template tag causing each extra round trip.
+        """
+        extra_origins = self.flush_origins[limit:]
+        if not extra_origins:
+            return
+
+        message = (
+            "Nodes resolved in %d round trips, expected at most %d. Extra round trips caused by:"
+            % (
+                len(self.flush_origins),
+                limit,
+            )
+        )
+        for number, origin in enumerate(extra_origins, limit + 1):
+            message += "\n  %d. %s" % (number, origin or "<outside templates>")
+
+        if raise_error:
+            raise TooManyRoundTrips(message)
+        warnings.warn(message, RoundTripWarning, stacklevel=2)
+
+    def server_timing(self):
+        """
+        Format recorded operations as Server-Timing metrics, with durations in milliseconds.
+        """
+        metrics = []
+        for operation in self.OPERATIONS:
+            metric = "djedi-%s;desc=%d" % (operation, self.counts[operation])
+            if operation != "flush":
+                metric += ";dur=%.3f" % (self.durations[operation] * 1000)
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+    def summary(self):
+        """
+        Format recorded operations as key=value pairs for log lines.
+        """
+        return " ".join(
+            "%s=%d/%.3fms" % (operation, count, self.durations[operation] * 1000)
+            for operation, count in self.counts.items()
+        )
+
+    def as_dict(self):
+        return {
+            operation: {
+                "count": self.counts[operation],
+                "ms": round(self.durations[operation] * 1000, 3),
+            }
+            for operation in self.OPERATIONS
+        }
+
+
+def start():
+    """
+    Start recording in current context. Returns recorder and token to stop with.
+    """
+    recorder = Recorder(parent=_recorder.get())
+    return recorder, _recorder.set(recorder)
+
+
+def stop(token):
+    _recorder.reset(token)
+
+
+def get_recorder():
+    return _recorder.get()
+
+
+def record_flush():
+    """
+    Record pipeline flush, with the template tag causing it, if recording.
+    """
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.record_flush(_origin.get())
+
+
+@contextmanager
+def origin(description):
+    """
+    Attribute pipeline flushes within block to described origin, e.g. a template tag.
+    """
+    token = _origin.set(description)
+    try:
+        yield
+    finally:
+        _origin.reset(token)
+
+
+@contextmanager
+def limit_round_trips(limit=1):
+    """
+    Raise TooManyRoundTrips if nodes are resolved in more than limit pipeline flushes within block,
+    e.g. in tests:
+
+        with limit_round_trips(1):
+            response = client.get("/")
+    """
+    recorder, token = start()
+    try:
+        yield recorder
+    finally:
+        stop(token)
+    recorder.check_round_trips(limit, raise_error=True)
+
+
+@contextmanager
+def timed(operation, count=1):
+    """
+    Record duration of operation within block, if recording.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.record(operation, time.perf_counter() - started_at, count)
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from djedi.backends.django.db.models import Node, PublishedNode
+
+
+class Command(BaseCommand):
+    help = "Rebuild the published nodes table from the node revision history."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of nodes to insert per query (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        published_nodes = Node.objects.filter(is_published=True).values_list(
+            "key", "content", "plugin", "version", "meta", "rendered"
+        )
+
+        count = 0
+        with transaction.atomic():
+            PublishedNode.objects.all().delete()
+
+            batch = []
+            for (
+                key,
+                content,
+                plugin,
+                version,
+                meta,
+                rendered,
+            ) in published_nodes.iterator(chunk_size=batch_size):
+                batch.append(
+                    PublishedNode(
+                        key=key,
+                        content=content,
+                        plugin=plugin,
+                        version=version,
+                        meta=meta,
+                        rendered=rendered,
+                    )
+                )
+                if len(batch) >= batch_size:
+                    PublishedNode.objects.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+
+            if batch:
+                PublishedNode.objects.bulk_create(batch)
+                count += len(batch)
+
+        self.stdout.write("Backfilled %d published nodes." % count)
@@ -0,0 +1,102 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from cio.backends import cache
+from cio.plugins import plugins
+from cio.plugins.exceptions import UnknownPlugin
+from cio.utils.uri import URI
+from djedi.backends.django.db.models import Node
+from djedi.pipeline import fill_many
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the cache with all published nodes, e.g. after deploys or cache flushes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--namespace",
+            action="append",
+            default=[],
+            help="Only warm nodes in namespace, e.g. sv-se or i18n://sv-se (repeatable).",
+        )
+        parser.add_argument(
+            "--language",
+            action="append",
+            default=[],
+            help="Only warm i18n nodes for language, e.g. sv-se (repeatable).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of nodes to fetch and cache per round trip (default: 500).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count and render nodes, without writing to the cache.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        dry_run = options["dry_run"]
+
+        nodes = Node.objects.filter(is_published=True)
+        query = self.build_query(options["namespace"], options["language"])
+        if query:
+            nodes = nodes.filter(query)
+        nodes = nodes.values_list("key", "content", "plugin", "version", "rendered")
+
+        count = 0
+        started_at = time.monotonic()
+        batch = {}
+        for key, content, plugin, version, rendered in nodes.iterator(
+            chunk_size=batch_size
+        ):
+            uri = URI(key).clone(ext=plugin, version=version)
+            if rendered is None:
+                try:
+                    _plugin = plugins.get(plugin)
+                except UnknownPlugin:
+                    self.stderr.write('Skipping node "%s"; unknown plugin.' % uri)
+                    continue
+                rendered = _plugin.render(_plugin.load(content))
+
+            batch[uri] = rendered
+            if len(batch) >= batch_size:
+                count += self.warm(batch, dry_run)
+                batch = {}
+
+        if batch:
+            count += self.warm(batch, dry_run)
+
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(
+            "%s %d nodes in %.2fs (%d nodes/s)."
+            % (
+                "Would warm" if dry_run else "Warmed",
+                count,
+                elapsed,
+                count / elapsed if elapsed else count,
+            )
+        )
+
+    def build_query(self, namespaces, languages):
+        query = Q()
+        for namespace in namespaces:
+            if "://" in namespace:
+                query |= Q(key__startswith="%s@" % namespace)
+            else:
+                query |= Q(key__contains="://%s@" % namespace)
+        for language in languages:
+            query |= Q(key__startswith="i18n://%s@" % language)
+        return query
+
+    def warm(self, nodes, dry_run=False):
+        if not dry_run:
+            fill_many(cache, nodes)
+        return len(nodes)
@@ -1,12 +1,33 @@
+try:
+    from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+except ImportError:  # asgiref < 3.6
+    from asyncio import coroutines, iscoroutinefunction
+
+    def markcoroutinefunction(func):
+        func._is_coroutine = coroutines._is_coroutine
+        return func
+
+
 import cio
 from cio.pipeline import pipeline
 
+from .. import state
+from .mixins import InstrumentationMixin
+
+
+class DjediMiddleware(InstrumentationMixin):
+    sync_capable = True
+    async_capable = True
 
-class DjediMiddleware:
     def __init__(self, get_response=None):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         response = self.process_request(request)
         if not response:
             try:
@@ -17,14 +38,38 @@ class DjediMiddleware:
                 raise
         return response
 
+    async def __acall__(self, request):
+        response = await self.aprocess_request(request)
+        if not response:
+            try:
+                response = await self.get_response(request)
+                response = await self.aprocess_response(
+                    request=request, response=response
+                )
+            except Exception as e:
+                self.process_exception(request=request, exception=e)
+                raise
+        return response
+
     def process_request(self, request):
-        # Bootstrap content-io
+        # Bootstrap content-io, with state of its own for each request, also concurrent async ones
+        state.activate()
         pipeline.clear()
         cio.env.reset()
+        self.start_instrumentation(request)
 
     def process_response(self, request, response):
         pipeline.clear()
+        self.stop_instrumentation(request, response)
         return response
 
     def process_exception(self, request, exception):
+        self.stop_instrumentation(request)
         pipeline.clear()
+
+    async def aprocess_request(self, request):
+        # Content-io state is context local, carried along into sync views by django
+        return self.process_request(request)
+
+    async def aprocess_response(self, request, response):
+        return self.process_response(request, response)
@@ -1,3 +1,5 @@
+from asgiref.sync import sync_to_async
+
 from . import DjediMiddleware
 from .mixins import AdminPanelMixin
 
@@ -6,3 +8,10 @@ class DjediAdminMiddleware(DjediMiddleware, AdminPanelMixin):
     def process_response(self, request, response):
         self.inject_admin_panel(request, response)
         return super().process_response(request, response)
+
+    async def aprocess_response(self, request, response):
+        if self.accepts_admin_panel(request, response):
+            # Permission checks may query the database
+            await sync_to_async(self.append_admin_panel)(request, response)
+
+        return super().process_response(request, response)
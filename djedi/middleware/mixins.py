@@ -1,17 +1,76 @@
+import gzip
 import logging
+import re
+from collections import deque
+from functools import lru_cache
 
+from django.conf import settings as django_settings
 from django.core.exceptions import ImproperlyConfigured
-from django.urls import NoReverseMatch, reverse
+from django.urls import NoReverseMatch, get_script_prefix, get_urlconf, reverse
 from django.utils import translation
+from django.utils.text import compress_string
 
 import cio
 from cio.conf import settings
 from cio.pipeline import pipeline
+from djedi import instrumentation
 from djedi.auth import has_permission
 from djedi.utils.templates import render_embed
 
 _log = logging.getLogger(__name__)
 
+BODY_END = re.compile(rb"</body>", re.IGNORECASE)
+
+# Bytes of streamed content held back to find </body> in
+STREAM_TAIL_SIZE = 4096
+
+
+class InstrumentationMixin:
+    def start_instrumentation(self, request):
+        if settings.get("INSTRUMENTATION") or settings.get("ROUND_TRIPS"):
+            request._djedi_instrumentation = instrumentation.start()
+
+    def stop_instrumentation(self, request, response=None):
+        """
+        Stop recording of request, report it and check its round trips, if enabled.
+        """
+        recording = request.__dict__.pop("_djedi_instrumentation", None)
+        if recording is None:
+            return
+
+        recorder, token = recording
+        instrumentation.stop(token)
+
+        config = settings.get("INSTRUMENTATION")
+        if config:
+            self.report_instrumentation(
+                request, response, recorder, {} if config is True else config
+            )
+
+        round_trips = settings.get("ROUND_TRIPS")
+        if round_trips and response is not None:
+            round_trips = {} if round_trips is True else round_trips
+            recorder.check_round_trips(
+                round_trips.get("LIMIT", 1), raise_error=round_trips.get("RAISE", False)
+            )
+
+    def report_instrumentation(self, request, response, recorder, config):
+        """
+        Report recorded operations as Server-Timing header and log line.
+        """
+        if response is not None and config.get("SERVER_TIMING", True):
+            server_timing = recorder.server_timing()
+            if response.has_header("Server-Timing"):
+                server_timing = response["Server-Timing"] + ", " + server_timing
+            response["Server-Timing"] = server_timing
+        if config.get("LOG", True):
+            instrumentation.logger.info(
+                "%s %s",
+                request.path,
+                recorder.summary(),
+                extra={"path": request.path, "djedi": recorder.as_dict()},
+            )
+
 
 class TranslationMixin:
     def activate_language(self):
@@ -22,46 +81,51 @@ class TranslationMixin:
 
 class AdminPanelMixin:
     def inject_admin_panel(self, request, response):
-        # Do not inject admin panel on gzipped responses
-        if "gzip" in response.get("Content-Encoding", ""):
-            _log.debug("gzip detected, not injecting panel.")
-            return
+        if self.accepts_admin_panel(request, response):
+            self.append_admin_panel(request, response)
+
+    def accepts_admin_panel(self, request, response):
+        """
+        Check if response may get the admin panel, without hitting the database.
+        """
+        # Do not inject admin panel on compressed streams, or other encodings than gzip
+        encoding = response.get("Content-Encoding", "")
+        if encoding and (encoding != "gzip" or response.streaming):
+            _log.debug("%s encoding detected, not injecting panel.", encoding)
+            return False
 
         # Only inject admin panel in html pages
         content_type = response.get("Content-Type", "").split(";")[0]
         if content_type not in ("text/html", "application/xhtml+xml"):
             _log.debug("Non-HTML Content-Type detected, not injecting")
-            return
+            return False
+
+        admin_prefix, djedi_cms_url = get_admin_prefixes(
+            get_urlconf(django_settings.ROOT_URLCONF),
+            get_script_prefix(),
+            translation.get_language(),
+        )
 
         # Do not inject admin panel in admin
-        try:
-            admin_prefix = reverse("admin:index")
-        except NoReverseMatch:
+        if admin_prefix is None:
             _log.debug(
                 'No reverse match for "admin:index", can\'t detect '
                 "django-admin pages"
             )
-        else:
-            if request.path.startswith(admin_prefix):
-                _log.debug(
-                    "admin page detected, not injecting panel. admin_prefix=%r",
-                    admin_prefix,
-                )
-                return
-
-        try:
-            djedi_cms_url = reverse("admin:djedi:cms")
-        except NoReverseMatch:
-            raise ImproperlyConfigured(
-                "Could not find djedi in your url conf, "
-                "enable django admin or include "
-                "djedi.urls within the admin namespace."
+        elif request.path.startswith(admin_prefix):
+            _log.debug(
+                "admin page detected, not injecting panel. admin_prefix=%r",
+                admin_prefix,
             )
-        else:
-            if request.path.startswith(djedi_cms_url):
-                _log.debug("djedi page detected, not injecting panel")
-                return
+            return False
 
+        if request.path.startswith(djedi_cms_url):
+            _log.debug("djedi page detected, not injecting panel")
+            return False
+
+        return True
+
+    def append_admin_panel(self, request, response):
         # Validate user permissions
         if not has_permission(request):
             _log.debug("insufficient permissions, not injecting.")
@@ -89,12 +153,104 @@ class AdminPanelMixin:
         return render_embed(nodes=defaults)
 
     def body_append(self, response, html):
-        idx = response.content.lower().rfind(b"</body>")
+        html = html.encode("utf8")
+
+        if response.streaming:
+            # Only hold back and rewrite the tail of streamed content
+            if getattr(response, "is_async", False):
+                content = self.astream_append(response.streaming_content, html)
+            else:
+                content = self.stream_append(response.streaming_content, html)
+            response.streaming_content = content
+            if response.has_header("Content-Length"):
+                del response["Content-Length"]
+            return
+
+        content = response.content
+        gzipped = response.get("Content-Encoding") == "gzip"
+        if gzipped:
+            content = gzip.decompress(content)
 
+        idx = rfind_body_end(content)
         if idx >= 0:
-            response.content = b"".join(
-                (response.content[:idx], html.encode("utf8"), response.content[idx:])
-            )
+            # Join slices of a memoryview, to copy content once
+            view = memoryview(content)
+            content = b"".join((view[:idx], html, view[idx:]))
+            response.content = compress_string(content) if gzipped else content
 
             if response.get("Content-Length", None):
                 response["Content-Length"] = len(response.content)
+
+    def stream_append(self, chunks, html):
+        tail = deque()
+        for chunk in chunks:
+            yield from self._release_chunks(tail, chunk)
+        yield self._tail_append(tail, html)
+
+    async def astream_append(self, chunks, html):
+        tail = deque()
+        async for chunk in chunks:
+            for released in self._release_chunks(tail, chunk):
+                yield released
+        yield self._tail_append(tail, html)
+
+    def _release_chunks(self, tail, chunk):
+        """
+        Buffer chunk in tail, and release leading chunks not needed to hold at least STREAM_TAIL_SIZE bytes.
+        """
+        tail.append(chunk)
+        size = sum(len(chunk) for chunk in tail)
+        while size - len(tail[0]) >= STREAM_TAIL_SIZE:
+            size -= len(tail[0])
+            yield tail.popleft()
+
+    def _tail_append(self, tail, html):
+        content = b"".join(tail)
+        idx = rfind_body_end(content)
+        if idx >= 0:
+            content = b"".join((content[:idx], html, content[idx:]))
+        return content
+
+
+@lru_cache(maxsize=32)
+def get_admin_prefixes(urlconf, script_prefix, language):
+    """
+    Reverse django admin and djedi cms url prefixes, once per urlconf, script prefix
+    and active language, for admin urls in i18n_patterns.
+    """
+    try:
+        admin_prefix = reverse("admin:index", urlconf)
+    except NoReverseMatch:
+        admin_prefix = None
+
+    try:
+        djedi_cms_url = reverse("admin:djedi:cms", urlconf)
+    except NoReverseMatch:
+        raise ImproperlyConfigured(
+            "Could not find djedi in your url conf, "
+            "enable django admin or include "
+            "djedi.urls within the admin namespace."
+        )
+
+    return admin_prefix, djedi_cms_url
+
+
+def rfind_body_end(content, window=STREAM_TAIL_SIZE):
+    """
+    Return index of last case insensitive </body> tag, or -1 if not found.
+    Scans backwards in windows, without lowercasing or copying content.
+    """
+    end = len(content)
+    while end > 0:
+        start = max(end - window, 0)
+        match = None
+        for match in BODY_END.finditer(content, start, end):
+            pass
+        if match is not None:
+            return match.start()
+        if start == 0:
+            break
+        # Overlap windows to find tags crossing window bounds
+        end = start + len(b"</body>") - 1
+
+    return -1
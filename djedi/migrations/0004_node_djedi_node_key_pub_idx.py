@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("djedi", "0003_alter_node_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="node",
+            index=models.Index(
+                fields=["key", "is_published"], name="djedi_node_key_pub_idx"
+            ),
+        ),
+    ]
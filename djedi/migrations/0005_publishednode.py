@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("djedi", "0004_node_djedi_node_key_pub_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PublishedNode",
+            fields=[
+                (
+                    "key",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("content", models.TextField(blank=True)),
+                ("plugin", models.CharField(max_length=8)),
+                ("version", models.CharField(max_length=255)),
+                ("meta", models.TextField(blank=True, null=True)),
+            ],
+            options={
+                "db_table": "djedi_published_node",
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("djedi", "0005_publishednode"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="node",
+            name="rendered",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="publishednode",
+            name="rendered",
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
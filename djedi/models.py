@@ -6,6 +6,6 @@ djedi.configure()
 
 # Setup node django model based on backend
 if storage.backend.scheme == "db":
-    from .backends.django.db.models import Node
+    from .backends.django.db.models import Node, PublishedNode
 
-    Node
+    Node, PublishedNode
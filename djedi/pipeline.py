@@ -0,0 +1,257 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ImproperlyConfigured
+
+from cio.backends import cache, storage
+from cio.conf import settings
+from cio.pipeline.pipes.cache import CachePipe as BaseCachePipe
+from cio.pipeline.pipes.plugin import PluginPipe as BasePluginPipe
+from cio.pipeline.pipes.storage import (
+    NamespaceFallbackPipe as BaseNamespaceFallbackPipe,
+    StoragePipe as BaseStoragePipe,
+)
+
+from .instrumentation import record_flush, timed
+
+_cache_on_get = ContextVar("djedi_cache_on_get", default=None)
+
+
+def cache_on_get():
+    """
+    Check if nodes got through the pipeline are cached, by CACHE_ON_GET setting unless overridden.
+    """
+    enabled = _cache_on_get.get()
+    if enabled is None:
+        return settings.CACHE.get("PIPE", {}).get("CACHE_ON_GET", True)
+    return enabled
+
+
+@contextmanager
+def override_cache_on_get(enabled):
+    """
+    Override CACHE_ON_GET setting within block, e.g. for gets with untrusted defaults.
+    Only honored by the djedi cache pipe, raising ImproperlyConfigured for other cache pipes.
+    """
+    # Lazy import, the pipeline loads this module
+    from cio.pipeline import pipeline
+
+    for pipe in pipeline.pipes:
+        if issubclass(pipe, BaseCachePipe) and not issubclass(pipe, CachePipe):
+            raise ImproperlyConfigured(
+                'Cache pipe "%s.%s" does not support overriding CACHE_ON_GET, '
+                'use "djedi.pipeline.CachePipe" in PIPELINE setting.'
+                % (pipe.__module__, pipe.__name__)
+            )
+
+    token = _cache_on_get.set(enabled)
+    try:
+        yield
+    finally:
+        _cache_on_get.reset(token)
+
+
+async def aget_many(manager, uris):
+    """
+    Get many nodes from cache or storage, through async backend variant if implemented.
+    """
+    uris = manager._clean_get_uris(uris)
+    backend = manager.backend
+    if hasattr(backend, "aget_many"):
+        return await backend.aget_many(uris)
+    return await sync_to_async(backend.get_many)(uris)
+
+
+def fill_many(manager, nodes):
+    """
+    Fill cache with nodes read from storage, without invalidating other processes if supported by backend.
+    """
+    nodes = {manager._clean_set_uri(uri): content for uri, content in nodes.items()}
+    backend = manager.backend
+    return getattr(backend, "fill_many", backend.set_many)(nodes)
+
+
+async def afill_many(manager, nodes):
+    """
+    Async variant of fill_many, through async backend variant if implemented.
+    """
+    nodes = {manager._clean_set_uri(uri): content for uri, content in nodes.items()}
+    backend = manager.backend
+    if hasattr(backend, "afill_many"):
+        return await backend.afill_many(nodes)
+    return await sync_to_async(getattr(backend, "fill_many", backend.set_many))(nodes)
+
+
+class MaterializeMixin:
+    def materialize_nodes(self, request, nodes):
+        """
+        Move found nodes from request to response.
+        """
+        response = {}
+        for uri, found_node in nodes.items():
+            node = response[node.uri] = request.pop(uri)
+            self.materialize_node(node, **found_node)
+        return response
+
+
+class CachePipe(MaterializeMixin, BaseCachePipe):
+    """
+    Cache pipe, instrumented and with async get handlers for djedi.aio.
+    """
+
+    def get_request(self, request):
+        # Every get through the pipeline is a flush of buffered nodes
+        record_flush()
+
+        uris = self.get_cache_uris(request)
+        if not uris:
+            return {}
+
+        with timed("cache"):
+            cached_nodes = cache.get_many(uris)
+        return self.materialize_nodes(request, cached_nodes)
+
+    async def aget_request(self, request):
+        record_flush()
+
+        uris = self.get_cache_uris(request)
+        if not uris:
+            return {}
+
+        with timed("cache"):
+            cached_nodes = await aget_many(cache, uris)
+        return self.materialize_nodes(request, cached_nodes)
+
+    def get_response(self, response):
+        nodes = self.get_cache_nodes(response)
+        if nodes and cache_on_get():
+            fill_many(cache, nodes)
+
+        return response
+
+    async def aget_response(self, response):
+        nodes = self.get_cache_nodes(response)
+        if nodes and cache_on_get():
+            await afill_many(cache, nodes)
+
+        return response
+
+    def get_cache_uris(self, request):
+        # Only get nodes from cache without specified version
+        return tuple(uri for uri, node in request.items() if not node.uri.version)
+
+    def get_cache_nodes(self, response):
+        nodes = {}
+
+        # Cache nodes without specified version (i.e. default or published)
+        for uri, node in response.items():
+            if not uri.version:
+                origin_uri = node.uri.clone(namespace=uri.namespace)
+                nodes[origin_uri] = node.content
+                # Empty node meta to be coherent with cached nodes
+                node.meta.clear()
+
+        return nodes
+
+
+class PluginPipe(BasePluginPipe):
+    """
+    Plugin pipe serving content prerendered by storage at publish time,
+    only rendering nodes without prerendered content.
+    """
+
+    def render_response(self, response):
+        unrendered = {}
+        for uri, node in response.items():
+            rendered = node.meta.pop("rendered", None) if node.meta else None
+            if rendered is None:
+                unrendered[uri] = node
+            else:
+                node.content = rendered
+
+        if unrendered:
+            with timed("render", count=len(unrendered)):
+                super().render_response(unrendered)
+
+        return response
+
+    async def aget_response(self, response):
+        # Rendering is cpu bound, no need for a thread
+        return self.get_response(response)
+
+
+class StoragePipe(MaterializeMixin, BaseStoragePipe):
+    """
+    Storage pipe, instrumented and with async get handlers for djedi.aio.
+    """
+
+    def get_request(self, request):
+        with timed("storage"):
+            stored_nodes = storage.get_many(request.keys())
+        return self.materialize_nodes(request, stored_nodes)
+
+    async def aget_request(self, request):
+        with timed("storage"):
+            stored_nodes = await aget_many(storage, request.keys())
+        return self.materialize_nodes(request, stored_nodes)
+
+    async def aget_response(self, response):
+        return self.get_response(response)
+
+
+class NamespaceFallbackPipe(BaseNamespaceFallbackPipe):
+    """
+    Namespace fallback pipe, instrumented and with async get handlers for djedi.aio.
+    """
+
+    def get_request(self, request):
+        response = {}
+        fallback_uris = self.get_fallback_uris(request)
+
+        # Fetch nodes from storage, each fallback level slice at a time
+        while fallback_uris:
+            level_uris = self.pop_level_uris(fallback_uris)
+            with timed("storage"):
+                stored_nodes = storage.get_many(level_uris.keys())
+            self.materialize_level(request, response, level_uris, stored_nodes)
+
+        return response
+
+    async def aget_request(self, request):
+        response = {}
+        fallback_uris = self.get_fallback_uris(request)
+
+        while fallback_uris:
+            level_uris = self.pop_level_uris(fallback_uris)
+            with timed("storage"):
+                stored_nodes = await aget_many(storage, level_uris.keys())
+            self.materialize_level(request, response, level_uris, stored_nodes)
+
+        return response
+
+    def get_fallback_uris(self, request):
+        fallback_uris = {}
+        for uri, node in request.items():
+            namespaces = getattr(node.env, uri.scheme)[1:]
+            if namespaces:
+                fallback_uris[node.uri] = [
+                    uri.clone(namespace=namespace) for namespace in namespaces
+                ]
+        return fallback_uris
+
+    def pop_level_uris(self, fallback_uris):
+        """
+        Pop next fallback level uris, dropping exhausted fallbacks.
+        """
+        level_uris = {fallback.pop(0): uri for uri, fallback in fallback_uris.items()}
+        for uri, fallback in list(fallback_uris.items()):
+            if not fallback:
+                fallback_uris.pop(uri)
+        return level_uris
+
+    def materialize_level(self, request, response, level_uris, stored_nodes):
+        # Set node fallback content and add to response
+        for uri, stored_node in stored_nodes.items():
+            node = response[node.uri] = request.pop(level_uris[uri])
+            self.materialize_node(node, **stored_node)
@@ -1,15 +1,31 @@
+from hashlib import sha1
+
 import simplejson as json
-from django.http import HttpResponse
+from django.core.exceptions import PermissionDenied
+from django.core.signing import BadSignature
+from django.http import Http404, HttpResponse
+from django.utils.cache import (
+    add_never_cache_headers,
+    get_conditional_response,
+    patch_cache_control,
+    quote_etag,
+)
 from django.utils.decorators import method_decorator
+from django.utils.encoding import smart_bytes
 from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 
 import cio
 import cio.conf
+from cio.backends import cache
 
+from .. import esi
 from ..admin.mixins import JSONResponseMixin
 from ..auth import has_permission
+from ..pipeline import override_cache_on_get
+from ..templatetags.djedi_tags import render_node
+from ..utils.cache import get_published_version
 from ..utils.templates import render_embed
 
 
@@ -31,22 +47,100 @@ class EmbedApi(View):
             return HttpResponse(status=204)
 
 
+class FragmentApi(View):
+    """
+    Single rendered node, included by pages through edge side includes.
+    Cached at the edge until the node is published, and purged by surrogate key.
+    """
+
+    def get(self, request, token):
+        try:
+            uri, default_key, edit, env = esi.loads(token)
+        except BadSignature:
+            raise Http404
+
+        default, found = esi.load_default(default_key)
+        with cio.env(**env):
+            node = cio.get(uri, default=default, lazy=False)
+
+        response = HttpResponse(render_node(node, edit=edit))
+        config = esi.get_config() or {}
+        if found or node.content is not None:
+            patch_cache_control(
+                response, public=True, max_age=config.get("TIMEOUT", 60 * 60 * 24)
+            )
+        else:
+            # Default evicted, render empty until stored again by a page render
+            add_never_cache_headers(response)
+        response[config.get("KEY_HEADER", "Surrogate-Key")] = esi.surrogate_key(uri)
+        return response
+
+
 class NodesApi(APIView):
     """
+    Resolve nodes by posting, or cacheable GET query string, {uri: default, ...}.
+    GET responses are validated by ETag of published content version, environment and query,
+    answering If-None-Match without resolving any node.
+
     JSON Response:
         {uri: content, uri: content, ...}
     """
 
+    def get(self, request):
+        etag = self.get_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self.render_nodes(request.GET.items())
+        response["ETag"] = etag
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
     @method_decorator(never_cache)
     def post(self, request):
+        return self.render_nodes(json.loads(request.body).items())
+
+    def get_etag(self, request):
+        env = cio.env.state
+        validator = "|".join(
+            (
+                str(get_published_version()),
+                repr((env.i18n, env.l10n, env.g11n)),
+                request.META.get("QUERY_STRING", ""),
+            )
+        )
+        return quote_etag(sha1(smart_bytes(validator)).hexdigest())
+
+    def render_nodes(self, defaults):
         # Disable caching gets in CachePipe, defaults through this api is not trusted
-        cio.conf.settings.configure(local=True, CACHE={"PIPE": {"CACHE_ON_GET": False}})
+        with override_cache_on_get(False):
+            nodes = []
+            for uri, default in defaults:
+                node = cio.get(uri, default=default)
+                nodes.append(node)
 
-        nodes = []
-        for uri, default in json.loads(request.body).items():
-            node = cio.get(uri, default=default)
-            nodes.append(node)
+            data = {node.uri: node.content for node in nodes}
 
-        data = {node.uri: node.content for node in nodes}
+        json_settings = cio.conf.settings.get("JSON", {})
+        if len(data) > json_settings.get("STREAM_THRESHOLD", 1000):
+            return self.render_to_json_stream(data)
 
         return self.render_to_json(data)
+
+
+class StatsApi(APIView):
+    """
+    Per-process cache stats, if enabled by cache backend.
+
+    JSON Response:
+        {cache: {calls: x, hits: y, misses: z, ..., latency: {...}} | null}
+    """
+
+    @method_decorator(never_cache)
+    def get(self, request):
+        if not has_permission(request):
+            raise PermissionDenied
+
+        stats = getattr(cache.backend, "stats", None)
+        return self.render_to_json(
+            {"cache": stats.snapshot() if stats is not None else None}
+        )
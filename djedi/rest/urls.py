@@ -1,7 +1,7 @@
 from django.http import Http404
 from django.urls import re_path
 
-from .api import EmbedApi, NodesApi
+from .api import EmbedApi, FragmentApi, NodesApi, StatsApi
 
 app_name = "rest"
 
@@ -13,5 +13,7 @@ def not_found(*args, **kwargs):
 urlpatterns = [
     re_path(r"^$", not_found, name="api-base"),
     re_path(r"^embed/$", EmbedApi.as_view(), name="embed"),
+    re_path(r"^fragment/(?P<token>[\w:-]+)/$", FragmentApi.as_view(), name="fragment"),
     re_path(r"^nodes/$", NodesApi.as_view(), name="nodes"),
+    re_path(r"^stats/$", StatsApi.as_view(), name="stats"),
 ]
@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent when published, updated published or deleted published nodes are committed to storage,
+# with argument: uris
+nodes_published = Signal()
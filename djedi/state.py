@@ -0,0 +1,100 @@
+"""
+Context local content-io state.
+
+Content-io keeps its environment, node buffer and pipeline history thread local, shared by
+concurrent async requests on the event loop thread. Once installed, by the djedi app, they are
+kept per context instead, i.e. per thread as before, per request activated by the djedi
+middlewares, and carried along into, and back from, ``sync_to_async`` threads.
+"""
+from collections import defaultdict
+from contextvars import ContextVar
+
+from cio.environment import DEFAULT, Environment
+from cio.pipeline.buffer import NodeBuffer
+from cio.pipeline.history import NodeHistory
+
+_locals = []
+
+
+def activate():
+    """
+    Activate fresh content-io state in current context, e.g. per request.
+    """
+    for local in _locals:
+        local.var.set(None)
+
+
+class ContextLocal:
+    """
+    Attribute kept in a context variable, lazily created by factory(instance).
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        _locals.append(self)
+
+    def __set_name__(self, owner, name):
+        self.var = ContextVar(f"djedi_{owner.__name__}_{name}", default=None)
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+
+        value = self.var.get()
+        if value is None:
+            value = self.factory(instance)
+            self.var.set(value)
+        return value
+
+    def __set__(self, instance, value):
+        self.var.set(value)
+
+
+def _default_stack(env):
+    env._stack = []
+    env.push(DEFAULT)
+    return env._stack
+
+
+class ContextEnvironment(Environment):
+    _stack = ContextLocal(_default_stack)
+
+    def __init__(self):
+        # Called by threading.local in each new thread, state is already per context
+        pass
+
+    def push_state(self, *args, **kwargs):
+        # Copy on write, the stack may be shared with contexts copied from this one, e.g. tasks
+        self._stack = list(self._stack)
+        super().push_state(*args, **kwargs)
+
+    def pop(self):
+        self._stack = list(self._stack)
+        super().pop()
+
+
+class ContextNodeBuffer(NodeBuffer):
+    _buffer = ContextLocal(lambda buffer: {})
+
+    def __init__(self):
+        pass
+
+
+class ContextNodeHistory(NodeHistory):
+    _history = ContextLocal(lambda history: defaultdict(list))
+
+    def __init__(self):
+        pass
+
+
+def install():
+    """
+    Keep state of the content-io environment and pipeline in current context, instead of thread.
+    """
+    from cio.environment import env
+    from cio.pipeline import pipeline
+
+    if not isinstance(env, ContextEnvironment):
+        env.__class__ = ContextEnvironment
+        pipeline._buffer = ContextNodeBuffer()
+        pipeline.history = ContextNodeHistory()
@@ -1,33 +1,175 @@
 import textwrap
+from weakref import WeakKeyDictionary
 
 from django import template
-from django.template import TemplateSyntaxError
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.base import Node as TemplateNode
 from django.template.library import parse_bits
+from django.template.loader_tags import (
+    ExtendsNode,
+    IncludeNode,
+    construct_relative_path,
+)
 
 import cio
+from cio.backends import cache
 
+from .. import esi, instrumentation
 from .template import register
 
 
+def render_content(node, context=None):
+    """
+    Render node content with context, through the render cache if supported by cache backend.
+    """
+    if not context or not hasattr(cache.backend, "get_rendered"):
+        return node.render(**context or {})
+
+    content = node.content
+    if content is None:
+        return None
+
+    output = cache.backend.get_rendered(node.uri, content, context)
+    if output is None:
+        output = node.render(**context)
+        cache.backend.set_rendered(node.uri, content, context, output)
+
+    return output
+
+
 def render_node(node, context=None, edit=True):
     """
     Render node as html for templates, with edit tagging.
     """
-    output = node.render(**context or {}) or ""
+    output = render_content(node, context) or ""
     if edit:
         return f'<span data-i18n="{node.uri.clone(scheme=None, ext=None, version=None)}">{output}</span>'
     else:
         return output
 
 
+# Memoized node uris and defaults per compiled template
+manifests = WeakKeyDictionary()
+
+PREFETCHED_NODES = "djedi.nodes"
+
+
+def get_manifest(template, seen=None):
+    """
+    Collect uris and defaults of all node tags in template, including constant includes and extends.
+    """
+    if template in manifests:
+        return manifests[template]
+
+    seen = seen or set()
+    seen.add(template)
+
+    manifest = []
+    for _node in template.nodelist.get_nodes_by_type(TemplateNode):
+        if isinstance(_node, BlockNode):
+            manifest.append((_node.uri, _node.default))
+        elif isinstance(getattr(_node, "render_func", None), NodeRenderer):
+            manifest.append((_node.render_func.uri, _node.render_func.default))
+        elif isinstance(_node, (ExtendsNode, IncludeNode)):
+            related = get_related_template(template, _node)
+            if related is not None and related not in seen:
+                manifest.extend(get_manifest(related, seen))
+
+    manifests[template] = manifest
+    return manifest
+
+
+def get_related_template(template, node):
+    """
+    Return template extended or included by node, if constant, else None.
+    """
+    name = node.parent_name if isinstance(node, ExtendsNode) else node.template
+    if name.filters or not isinstance(name.var, str):
+        return None
+
+    try:
+        name = construct_relative_path(template.origin.template_name, name.var)
+        return template.engine.get_template(name)
+    except (TemplateDoesNotExist, TemplateSyntaxError):
+        return None
+
+
+def get_node(context, uri, default):
+    """
+    Get node for this render, prefetching all nodes of the rendered template at once on first call.
+    """
+    # Root render context is shared by included templates
+    render_context = context.render_context.dicts[0]
+    nodes = render_context.get(PREFETCHED_NODES)
+    if nodes is None:
+        nodes = render_context[PREFETCHED_NODES] = {}
+        if context.template is not None:
+            for key in get_manifest(context.template):
+                # Manifests of included templates may repeat nodes, buffer each once
+                if key not in nodes:
+                    nodes[key] = cio.get(*key)
+            if nodes:
+                # Flush buffered nodes in a single pipeline call
+                next(iter(nodes.values())).flush()
+
+    node = nodes.get((uri, default))
+    if node is None:
+        # Not part of manifest, e.g. in dynamically included templates
+        node = nodes[(uri, default)] = cio.get(uri, default)
+
+    return node
+
+
+def get_tag_origin(context, tag):
+    """
+    Describe template tag being rendered, e.g. "page.html: {% node 'page/title' %}".
+    """
+    template = context.render_context.template
+    name = template.origin.template_name or template.origin.name if template else None
+    return "%s: {%% %s %%}" % (name or "<unknown template>", tag)
+
+
+def render_traced(context, tag, render):
+    """
+    Render tag, attributing pipeline flushes to it when instrumented.
+    """
+    if instrumentation.get_recorder() is None:
+        return render()
+
+    with instrumentation.origin(get_tag_origin(context, tag)):
+        return render()
+
+
+class NodeRenderer:
+    """
+    Render phase of node tag, getting node for uri per render.
+    """
+
+    def __init__(self, uri, default, edit):
+        self.uri = uri
+        self.default = default
+        self.edit = edit
+
+    def __call__(self, context):
+        return render_traced(
+            context, "node '%s'" % self.uri, lambda: self.render(context)
+        )
+
+    def render(self, context):
+        if esi.is_enabled(context):
+            return esi.render_include(self.uri, self.default, self.edit)
+
+        node = get_node(context, self.uri, self.default)
+        return render_node(node, edit=self.edit)
+
+
 @register.lazy_tag
 def node(key, default=None, edit=True):
     """
     Simple node tag:
     {% node 'page/title' default='Lorem ipsum' edit=True %}
     """
-    node = cio.get(key, default=default or "")
-    return lambda _: render_node(node, edit=edit)
+    return NodeRenderer(key, default or "", edit)
 
 
 class BlockNode(template.Node):
@@ -72,24 +214,33 @@ class BlockNode(template.Node):
         default = default.strip("\n\r")
         default = textwrap.dedent(default)
 
-        # Get node for uri, lacks context variable lookup due to lazy loading.
-        node = cio.get(uri, default)
-
-        return cls(tokens, node, kwargs)
+        # Node for uri is fetched per render, lacks context variable lookup due to prefetching.
+        return cls(tokens, uri, default, kwargs)
 
-    def __init__(self, tokens, node, kwargs):
+    def __init__(self, tokens, uri, default, kwargs):
         self.tokens = tokens
-        self.node = node
+        self.uri = uri
+        self.default = default
         self.kwargs = kwargs
 
     def render(self, context):
+        return render_traced(
+            context, "blocknode '%s'" % self.uri, lambda: self.render_node(context)
+        )
+
+    def render_node(self, context):
         # Resolve tag kwargs against context
         resolved_kwargs = {
             key: value.resolve(context) for key, value in self.kwargs.items()
         }
         edit = resolved_kwargs.pop("edit", True)
 
-        return render_node(self.node, context=resolved_kwargs, edit=edit)
+        # Nodes rendered with context are always inlined
+        if not resolved_kwargs and esi.is_enabled(context):
+            return esi.render_include(self.uri, self.default, edit)
+
+        node = get_node(context, self.uri, self.default)
+        return render_node(node, context=resolved_kwargs, edit=edit)
 
 
 register.tag("blocknode", BlockNode.tag)
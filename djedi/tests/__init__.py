@@ -1,5 +1,7 @@
 from .test_admin import *  # noqa
+from .test_aio import *  # noqa
 from .test_cache import *  # noqa
 from .test_rest import *  # noqa
 from .test_settings import *  # noqa
+from .test_storage import *  # noqa
 from .test_templatetags import *  # noqa
@@ -29,10 +29,14 @@ class DjediTest(TransactionTestCase):
 
     @contextmanager
     def settings(self, *args, **kwargs):
-        with super().settings(*args, **kwargs):
-            with cio_settings():
-                configure()
-                yield
+        try:
+            with super().settings(*args, **kwargs):
+                with cio_settings():
+                    configure()
+                    yield
+        finally:
+            # Reload backends and pipeline with restored settings
+            configure()
 
 
 class AssertionMixin:
@@ -1,10 +1,28 @@
-from unittest import skip
+import asyncio
+import gzip
+from unittest import mock, skip
 
+import django
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.encoding import smart_str
+from django.utils.text import compress_string
 
+import cio
 import cio.conf
+from cio.backends import cache
+from djedi import instrumentation
+from djedi.auth import PERMISSION_VERSION_KEY
+from djedi.instrumentation import RoundTripWarning, TooManyRoundTrips
+from djedi.middleware.mixins import STREAM_TAIL_SIZE, AdminPanelMixin, rfind_body_end
+from djedi.middleware.translation import DjediTranslationMiddleware
 from djedi.tests.base import ClientTest
+from djedi.tests.urls import async_index
+from djedi.utils.cache import bump_counter
 
 
 class PanelTest(ClientTest):
@@ -29,6 +47,184 @@ class PanelTest(ClientTest):
             response = self.client.get(url)
             self.assertNotIn("window.DJEDI_NODES", smart_str(response.content))
 
+    async def test_async_middleware(self):
+        client = AsyncClient()
+        client.cookies = self.client.cookies
+
+        with self.settings(
+            LANGUAGES=[("sv-se", "Swedish"), ("en-us", "English")],
+            MIDDLEWARE=[
+                "django.contrib.sessions.middleware.SessionMiddleware",
+                "django.middleware.locale.LocaleMiddleware",
+                "django.contrib.auth.middleware.AuthenticationMiddleware",
+                "djedi.middleware.translation.DjediTranslationMiddleware",
+            ],
+        ):
+            middleware = DjediTranslationMiddleware(async_index)
+            self.assertTrue(iscoroutinefunction(middleware))
+
+            # Language is activated for nodes of sync views,
+            # async client extra kwargs are asgi headers
+            response = await client.get(
+                reverse("index"), **{"accept-language": "en-us"}
+            )
+            self.assertIn("window.DJEDI_NODES", smart_str(response.content))
+            self.assertIn("i18n://en-us@foo/bar.txt", smart_str(response.content))
+
+            # and of async views, each concurrent request with content-io state of its own
+            responses = await asyncio.gather(
+                *(
+                    client.get(reverse("async_index"), **{"accept-language": language})
+                    for language in ("en-us", "sv-se", "en-us")
+                )
+            )
+            for response, language, other in zip(
+                responses, ("en-us", "sv-se", "en-us"), ("sv-se", "en-us", "sv-se")
+            ):
+                content = smart_str(response.content)
+                self.assertIn(f"i18n://{language}@foo/async.txt", content)
+                self.assertIn(f"i18n://{language}@foo/title.txt", content)
+                self.assertNotIn(f"i18n://{other}@", content)
+
+    def test_body_append(self):
+        panel = AdminPanelMixin()
+        html = "<b>Ä</b>"
+
+        response = HttpResponse("<html><BODY></BODY></html>")
+        panel.body_append(response, html)
+        self.assertEqual(
+            smart_str(response.content), "<html><BODY><b>Ä</b></BODY></html>"
+        )
+        self.assertEqual(rfind_body_end(b"</body>" + b"x" * 100, window=10), 0)
+        self.assertEqual(rfind_body_end(b"<body>"), -1)
+
+        response = HttpResponse(compress_string(b"<body></body>" + b"x" * 10000))
+        response["Content-Encoding"] = "gzip"
+        response["Content-Length"] = len(response.content)
+        panel.body_append(response, html)
+        content = gzip.decompress(response.content)
+        self.assertTrue(content.startswith("<body><b>Ä</b></body>".encode()))
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+
+        # Only the tail of streamed content is held back, tags may cross chunks
+        chunks = [
+            b"x" * STREAM_TAIL_SIZE,
+            b"y" * STREAM_TAIL_SIZE,
+            b"<body></bo",
+            b"dy>",
+        ]
+        chunks.append(b"</html>")
+        response = StreamingHttpResponse(iter(chunks))
+        panel.body_append(response, html)
+        streamed = list(response.streaming_content)
+        self.assertEqual(streamed[0], chunks[0])
+        self.assertEqual(
+            b"".join(streamed[1:]), chunks[1] + "<body><b>Ä</b></body></html>".encode()
+        )
+
+        # Async iterators are streamed natively on Django 4.2 and later
+        if django.VERSION < (4, 2):
+            return
+
+        async def achunks():
+            for chunk in chunks:
+                yield chunk
+
+        async def aconsume(content):
+            return [chunk async for chunk in content]
+
+        response = StreamingHttpResponse(achunks())
+        panel.body_append(response, html)
+        streamed = async_to_sync(aconsume)(response.streaming_content)
+        self.assertEqual(
+            b"".join(streamed),
+            chunks[0] + chunks[1] + "<body><b>Ä</b></body></html>".encode(),
+        )
+
+    def test_permission_memo(self):
+        apprentice = self.create_djedi_apprentice()
+        self.client.login(username=apprentice.username, password="test")
+        url = reverse("index")
+
+        def get_panel():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            group_queries = [q for q in queries if "auth_group" in q["sql"]]
+            return "window.DJEDI_NODES" in smart_str(response.content), group_queries
+
+        # Permission is checked once per request by default
+        panel, group_queries = get_panel()
+        self.assertTrue(panel)
+        self.assertEqual(len(group_queries), 1)
+        panel, group_queries = get_panel()
+        self.assertEqual(len(group_queries), 1)
+
+        with self.settings(DJEDI={"PERMISSION_TIMEOUT": 60}):
+            panel, group_queries = get_panel()
+            self.assertTrue(panel)
+            self.assertEqual(len(group_queries), 1)
+
+            # Permission is memoized in session
+            panel, group_queries = get_panel()
+            self.assertTrue(panel)
+            self.assertEqual(group_queries, [])
+
+            # and invalidated on group changes
+            apprentice.groups.clear()
+            panel, group_queries = get_panel()
+            self.assertFalse(panel)
+            self.assertEqual(len(group_queries), 1)
+
+            # by any process sharing the cache
+            panel, group_queries = get_panel()
+            self.assertEqual(group_queries, [])
+            bump_counter(PERMISSION_VERSION_KEY)
+            panel, group_queries = get_panel()
+            self.assertEqual(len(group_queries), 1)
+
+    def test_instrumentation(self):
+        url = reverse("index")
+        response = self.client.get(url)
+        self.assertFalse(response.has_header("Server-Timing"))
+
+        cio.set("i18n://sv-se@foo/bar.txt", "Djedi")
+        cache.clear()
+
+        with self.settings(DJEDI={"INSTRUMENTATION": True}):
+            with self.assertLogs("djedi.instrumentation") as logs:
+                response = self.client.get(url)
+
+            server_timing = response["Server-Timing"]
+            self.assertIn("djedi-flush;desc=1", server_timing)
+            self.assertIn("djedi-cache;desc=1;dur=", server_timing)
+            self.assertIn("djedi-storage;desc=1;dur=", server_timing)
+            self.assertIn("djedi-render;desc=1;dur=", server_timing)
+
+            (record,) = logs.records
+            self.assertEqual(record.path, url)
+            self.assertEqual(record.djedi["flush"]["count"], 1)
+            self.assertIn("cache=1/", record.getMessage())
+
+        with self.settings(DJEDI={"INSTRUMENTATION": {"LOG": False}}):
+            with mock.patch.object(instrumentation.logger, "info") as log:
+                response = self.client.get(url)
+            log.assert_not_called()
+            self.assertIn("djedi-cache;desc=1;dur=", response["Server-Timing"])
+            self.assertIn("djedi-storage;desc=0;dur=", response["Server-Timing"])
+
+    def test_round_trips(self):
+        url = reverse("index")
+        with self.settings(DJEDI={"ROUND_TRIPS": True}):
+            self.client.get(url)
+
+        with self.settings(DJEDI={"ROUND_TRIPS": {"LIMIT": 0}}):
+            with self.assertWarnsRegex(RoundTripWarning, "index.html"):
+                self.client.get(url)
+
+        with self.settings(DJEDI={"ROUND_TRIPS": {"LIMIT": 0, "RAISE": True}}):
+            with self.assertRaises(TooManyRoundTrips):
+                self.client.get(url)
+
     def test_cms(self):
         url = reverse("admin:djedi:cms")
         response = self.client.get(url)
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+
+from asgiref.sync import sync_to_async
+
+import cio
+from cio.backends import cache, storage
+from cio.environment import env
+from cio.pipeline import pipeline
+from cio.utils.uri import URI
+from djedi import aio, state
+from djedi.tests.base import AssertionMixin, DjediTest
+
+# Shortcut through a function, lazy cio shortcuts confuse sync_to_async
+set_node = sync_to_async(lambda uri, content: cio.set(uri, content))
+
+
+class AsyncTest(DjediTest, AssertionMixin):
+    async def test_get_many(self):
+        await set_node("i18n://sv-se@page/title.txt", "Djedi")
+        await set_node("i18n://en-us@page/body.md", "# Lightning fast")
+        cache.clear()
+
+        uris = {
+            "page/title": None,
+            "i18n://sv-se@page/title": "Duplicate",
+            "page/body": "Body",
+            "page/footer.txt": "Footer",
+        }
+        with env(i18n=["sv-se", "en-us"]):
+            with self.assertCache(calls=2, misses=3, sets=3):
+                nodes = await aio.get_many(uris)
+
+        self.assertEqual(nodes["page/title"].content, "Djedi")
+        self.assertEqual(nodes["page/title"].uri, "i18n://sv-se@page/title.txt#1")
+        self.assertEqual(nodes["i18n://sv-se@page/title"].content, "Djedi")
+        self.assertEqual(nodes["page/body"].content, "<h1>Lightning fast</h1>")
+        self.assertEqual(nodes["page/footer.txt"].content, "Footer")
+
+        # Nodes are served by cache
+        with self.assertCache(calls=1, hits=1), self.assertDB(calls=0):
+            node = await aio.get("page/title")
+        self.assertEqual(node.content, "Djedi")
+
+    async def test_context_state(self):
+        async def get_title(language):
+            state.activate()
+            with env(i18n=language):
+                await asyncio.sleep(0.01)
+                node = await aio.get("page/title", default="Title")
+            return node.uri.namespace, pipeline.history.list("get")
+
+        pipeline.history.clear()
+        (sv_namespace, sv_history), (en_namespace, en_history) = await asyncio.gather(
+            get_title("sv-se"), get_title("en-us")
+        )
+
+        # Concurrent tasks resolve nodes in their own environment and history
+        self.assertEqual(sv_namespace, "sv-se")
+        self.assertEqual(en_namespace, "en-us")
+        self.assertEqual([node.uri.namespace for node in sv_history], ["sv-se"])
+        self.assertEqual([node.uri.namespace for node in en_history], ["en-us"])
+        self.assertEqual(env.i18n, ("sv-se",))
+        self.assertEqual(len(pipeline.history), 0)
+
+        # Environments are isolated per task, also without activating state
+        async def get_namespace(language):
+            with env(i18n=language):
+                await asyncio.sleep(0.01)
+                node = await aio.get("page/title", default="Title")
+            return node.uri.namespace
+
+        namespaces = await asyncio.gather(
+            get_namespace("sv-se"), get_namespace("en-us")
+        )
+        self.assertEqual(namespaces, ["sv-se", "en-us"])
+
+    async def test_backends(self):
+        await set_node("i18n://sv-se@page/title.txt", "Djedi")
+
+        uri = URI("i18n://sv-se@page/title")
+        nodes = await storage.backend.aget_many([uri])
+        self.assertEqual(nodes[uri]["content"], "Djedi")
+        self.assertTrue(nodes[uri]["meta"]["is_published"])
+
+        await cache.backend.aset_many({URI("i18n://sv-se@page/title.txt#1"): "Titel"})
+        nodes = await cache.backend.aget_many([uri])
+        self.assertEqual(nodes[uri]["content"], "Titel")
+
+        # Advanced cache features fall back on the sync api
+        with self.settings(
+            DJEDI_CACHE={
+                "BACKEND": "djedi.backends.django.cache.Backend",
+                "L1": True,
+                "NEGATIVE_TIMEOUT": 60,
+                "SOFT_TIMEOUT": 60,
+                "GENERATIONS": True,
+            }
+        ):
+            await cache.backend.aset_many(
+                {URI("i18n://sv-se@page/title.txt#1"): "Titel"}
+            )
+            nodes = await cache.backend.aget_many([uri])
+            self.assertEqual(nodes[uri]["content"], "Titel")
+
+    async def test_local_and_negative_cache(self):
+        with self.settings(
+            DJEDI_CACHE={
+                "BACKEND": "djedi.backends.django.cache.Backend",
+                "L1": True,
+                "NEGATIVE_TIMEOUT": 60,
+                "SOFT_TIMEOUT": 60,
+            },
+            DJEDI_STORAGE={
+                "BACKEND": "djedi.backends.django.db.Backend",
+                "PUBLISHED_NODES": True,
+            },
+        ):
+            node = await aio.get("page/title", default="Title")
+            self.assertEqual(node.content, "Title")
+            with self.assertDB(calls=0):
+                node = await aio.get("page/title", default="Title")
+            self.assertEqual(node.content, "Title")
+
+            # Publishing drops negative entries
+            await set_node("i18n://sv-se@page/title.txt", "Djedi")
+            node = await aio.get("page/title", default="Title")
+            self.assertEqual(node.content, "Djedi")
+
+    async def test_non_blocking_pipes(self):
+        class Pipe:
+            def get_response(self, response):
+                self.thread = threading.get_ident()
+                return response
+
+        class NonBlockingPipe(Pipe):
+            non_blocking = True
+
+        pipe, non_blocking_pipe = Pipe(), NonBlockingPipe()
+        await aio._call(pipe.get_response, {})
+        await aio._call(non_blocking_pipe.get_response, {})
+        self.assertNotEqual(pipe.thread, threading.get_ident())
+        self.assertEqual(non_blocking_pipe.thread, threading.get_ident())
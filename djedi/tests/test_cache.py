@@ -1,5 +1,33 @@
+import gc
+import threading
+import time
+from hashlib import sha1
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+
+import cio
 from cio.backends import cache
-from djedi.tests.base import DjediTest
+from cio.environment import env
+from cio.pipeline import pipeline
+from cio.utils.uri import URI
+from djedi.backends.django.cache.backend import (
+    FLAG_ZLIB,
+    DjangoCacheBackend,
+    LocalCache,
+)
+from djedi.backends.django.db.models import Node
+from djedi.backends.redis.backend import RedisCacheBackend
+from djedi.tests.base import AssertionMixin, DjediTest
+
+try:
+    import fakeredis
+except ImportError:  # pragma: no cover
+    fakeredis = None
+
+CACHE_BACKEND = "djedi.backends.django.cache.Backend"
 
 
 class CacheTest(DjediTest):
@@ -16,3 +44,360 @@ class CacheTest(DjediTest):
 
         cache.delete(uri)
         self.assertIsNone(cache.get(uri))
+
+
+class LocalCacheTest(DjediTest, AssertionMixin):
+    def test_local_cache(self):
+        uri = "i18n://sv-se@page/title.txt#1"
+
+        with self.settings(DJEDI_CACHE={"BACKEND": CACHE_BACKEND, "L1": True}):
+            cache.set(uri, "Title")
+
+            with self.assertCache(calls=0):
+                node = cache.get(uri)
+            self.assertEqual(node["content"], "Title")
+
+            # Simulate publish from another process
+            cache.backend._cache.incr(cache.backend.VERSION_KEY)
+            cache.backend._cache.set(
+                cache.backend._build_cache_key(URI(uri)),
+                cache.backend._encode_content(uri, "Titel"),
+            )
+            cache.backend._local.checked_at = None
+
+            with self.assertCache(calls=2, hits=2):
+                node = cache.get(uri)
+            self.assertEqual(node["content"], "Titel")
+
+            cache.delete(uri)
+            self.assertIsNone(cache.get(uri))
+
+            # Fills of nodes read from storage don't invalidate other processes
+            version = cache.backend._cache.get(cache.backend.VERSION_KEY)
+            cache.backend.fill_many({URI(uri): "Titel"})
+            self.assertEqual(
+                cache.backend._cache.get(cache.backend.VERSION_KEY), version
+            )
+            with self.assertCache(calls=0):
+                self.assertEqual(cache.get(uri)["content"], "Titel")
+
+            cache.set(uri, "Title")
+            self.assertEqual(
+                cache.backend._cache.get(cache.backend.VERSION_KEY), version + 1
+            )
+
+    def test_eviction(self):
+        local = LocalCache(max_size=10, timeout=60)
+        local.set_many({"a": b"1234", "b": b"1234"})
+        self.assertEqual(local.size, 10)
+
+        local.get_many(["a"])
+        local.set_many({"c": b"12"})
+        self.assertEqual(set(local.get_many(["a", "b", "c"])), {"a", "c"})
+
+        local.set_many({"d": b"12345678910"})
+        self.assertEqual(local.get_many(["d"]), {})
+
+        local.timeout = 0
+        local.set_many({"e": b"1"})
+        self.assertEqual(local.get_many(["e"]), {})
+        self.assertEqual(len(local), 2)
+
+
+class GenerationCacheTest(DjediTest):
+    def test_clear(self):
+        sv_uri = "i18n://sv-se@page/title.txt#1"
+        en_uri = "i18n://en-us@page/title.txt#1"
+
+        with self.settings(
+            DJEDI_CACHE={
+                "BACKEND": CACHE_BACKEND,
+                "GENERATIONS": True,
+                "TIMEOUT": 3600,
+            }
+        ):
+            _cache = cache.backend._cache
+            _cache.set("foo", "bar")
+
+            cache.set(sv_uri, "Titel")
+            cache.set(en_uri, "Title")
+            sv_key = cache.backend._build_cache_key(URI(sv_uri))
+            self.assertIsNotNone(_cache.get(sv_key))
+
+            cache.backend.clear("i18n://sv-se")
+            self.assertIsNone(cache.get(sv_uri))
+            self.assertEqual(cache.get(en_uri)["content"], "Title")
+
+            cache.clear()
+            self.assertIsNone(cache.get(en_uri))
+
+            # Old keys and unrelated data is left to expire
+            self.assertIsNotNone(_cache.get(sv_key))
+            self.assertEqual(_cache.get("foo"), "bar")
+
+            # Evicted generations never reuse old values
+            _cache.delete(cache.backend.GENERATION_KEY)
+            generations = cache.backend._generations
+            cache.backend._generations_checked_at = None
+            self.assertNotEqual(cache.backend._build_cache_key(URI(sv_uri)), sv_key)
+
+            # Expired generations are swapped, not cleared under concurrent readers
+            self.assertIsNot(cache.backend._generations, generations)
+            self.assertIn(cache.backend.GENERATION_KEY, generations)
+
+        with self.assertRaises(ImproperlyConfigured):
+            cache.backend.clear("i18n://sv-se")
+
+
+class SingleFlightCacheTest(DjediTest):
+    def test_lease(self):
+        uri = "i18n://sv-se@page/title.txt#1"
+        config = {
+            "BACKEND": CACHE_BACKEND,
+            "SINGLE_FLIGHT": {"WAIT_TIMEOUT": 5, "POLL_INTERVAL": 0.01},
+        }
+
+        with self.settings(DJEDI_CACHE=config):
+            # First miss takes the lease and fills the cache
+            self.assertIsNone(cache.get(uri))
+
+            # Concurrent misses wait for the lease holder to fill the cache
+            nodes = []
+            waiter = threading.Thread(target=lambda: nodes.append(cache.get(uri)))
+            waiter.start()
+            cache.set(uri, "Title")
+            waiter.join()
+            self.assertEqual(nodes[0]["content"], "Title")
+
+            # Filling the cache releases the lease
+            self.assertEqual(cache.backend._leases.keys, {})
+
+        config["SINGLE_FLIGHT"]["WAIT_TIMEOUT"] = 0.05
+        with self.settings(DJEDI_CACHE=config):
+            # Waiters give up and fill by themselves after wait timeout
+            cache.delete(uri)
+            self.assertIsNone(cache.get(uri))
+            self.assertIsNone(cache.get(uri))
+
+
+class StaleWhileRevalidateCacheTest(DjediTest, AssertionMixin):
+    def test_refresh(self):
+        uri = "i18n://sv-se@page/title"
+
+        with self.settings(DJEDI_CACHE={"BACKEND": CACHE_BACKEND, "SOFT_TIMEOUT": 60}):
+            cio.set("i18n://sv-se@page/title.txt", "Title")
+            cio.set("i18n://sv-se@page/body.txt", "Body", publish=False)
+            self.assertEqual(cio.get(uri, default="Default").content, "Title")
+            self.assertEqual(cio.get("page/body", default="Default").content, "Default")
+
+            # Simulate change in storage, bypassing cache, and soft expired entries
+            Node.objects.filter(version="1").update(content="Titel")
+            cache.backend.soft_timeout = 0
+            cache.set_many(
+                {
+                    URI("i18n://sv-se@page/title.txt#1"): "Title",
+                    URI("i18n://sv-se@page/body.txt"): "Default",
+                }
+            )
+            cache.backend.soft_timeout = 60
+
+            # Stale content is served while refreshed in the background
+            with self.assertDB(calls=0):
+                self.assertEqual(cio.get(uri).content, "Title")
+                self.assertEqual(cio.get("page/body").content, "Default")
+            cache.backend._refresher.submit(lambda: None).result()
+
+            with self.assertDB(calls=0):
+                self.assertEqual(cio.get(uri).content, "Titel")
+                self.assertEqual(cio.get("page/body").content, "Default")
+
+            # Pipeline history of the refresh thread is cleared
+            history = cache.backend._refresher.submit(lambda: len(pipeline.history))
+            self.assertEqual(history.result(), 0)
+
+            # Entries cached with soft expiry are still read when disabled
+            cache.backend.soft_timeout = None
+            with self.assertDB(calls=0):
+                self.assertEqual(cio.get(uri).content, "Titel")
+            cache.backend.soft_timeout = 60
+
+
+class NegativeCacheTest(DjediTest, AssertionMixin):
+    def test_negative_cache(self):
+        with self.settings(
+            DJEDI_CACHE={"BACKEND": CACHE_BACKEND, "NEGATIVE_TIMEOUT": 60}
+        ), env(i18n=("sv-se", "en-us")):
+            with mock.patch.object(
+                cache.backend._cache, "set_many", wraps=cache.backend._cache.set_many
+            ) as set_many, self.assertDB(calls=2):
+                node = cio.get("page/title", default="Default", lazy=False)
+                self.assertEqual(node.content, "Default")
+            set_many.assert_called_once_with(mock.ANY, timeout=60)
+
+            # Missing nodes are cached for the whole fallback chain
+            with self.assertDB(calls=0):
+                node = cio.get("page/title", default="Default", lazy=False)
+                self.assertEqual(node.content, "Default")
+
+            # Negative entries are still read when disabled
+            cache.backend.negative_timeout = None
+            with self.assertDB(calls=0):
+                node = cio.get("page/title", default="Default", lazy=False)
+                self.assertEqual(node.content, "Default")
+                self.assertEqual(node.uri, "i18n://sv-se@page/title.txt")
+            cache.backend.negative_timeout = 60
+
+            # Publishing any node invalidates negative entries, even for fallbacks
+            cio.set("i18n://en-us@page/title.txt", "Title")
+            with self.assertDB(calls=2):
+                node = cio.get("page/title", default="Default", lazy=False)
+                self.assertEqual(node.content, "Title")
+            with self.assertDB(calls=0):
+                node = cio.get("page/title", default="Default", lazy=False)
+                self.assertEqual(node.content, "Title")
+
+
+class WarmCacheTest(DjediTest, AssertionMixin):
+    def test_warm_cache(self):
+        cio.set("i18n://sv-se@page/title.txt", "Titel")
+        cio.set("i18n://en-us@page/title.md", "# Title")
+        cio.set("i18n://en-us@page/body.txt", "Body", publish=False)
+        cache.clear()
+
+        stdout = StringIO()
+        with self.assertCache(sets=0):
+            call_command("djedi_warm_cache", dry_run=True, stdout=stdout)
+        self.assertIn("Would warm 2 nodes", stdout.getvalue())
+
+        stdout = StringIO()
+        call_command("djedi_warm_cache", language=["en-us"], stdout=stdout)
+        self.assertIn("Warmed 1 nodes", stdout.getvalue())
+        self.assertIsNone(cache.get("i18n://sv-se@page/title"))
+        node = cache.get("i18n://en-us@page/title")
+        self.assertEqual(node["uri"], "i18n://en-us@page/title.md#1")
+        self.assertEqual(node["content"], "<h1>Title</h1>")
+
+        call_command("djedi_warm_cache", batch_size=1, stdout=StringIO())
+        with self.assertDB(calls=0):
+            self.assertEqual(cio.get("page/title", lazy=False).content, "Titel")
+
+
+class ValueFormatCacheTest(DjediTest):
+    def test_value_format(self):
+        uri = URI("i18n://sv-se@page/body.md#1")
+        content = "<p>Lorem ipsum dolor sit amet.</p>" * 10
+        legacy_value = cache.backend._encode_content(uri, content)
+
+        with self.settings(
+            DJEDI_CACHE={"BACKEND": CACHE_BACKEND, "VALUE_FORMAT": {"THRESHOLD": 100}}
+        ):
+            key = cache.backend._build_cache_key(uri)
+            _cache = cache.backend._cache
+
+            cache.set(uri, content)
+            value = _cache.get(key)
+            self.assertEqual(value[:2], b"\x01" + bytes([FLAG_ZLIB]))
+            self.assertLess(len(value), len(legacy_value) / 2)
+            self.assertEqual(cache.get(uri), {"uri": uri, "content": content})
+
+            # Small and missing content is stored as text, binary format saves nothing uncompressed
+            cache.set(uri, "Lorem ipsum")
+            self.assertEqual(_cache.get(key), str(uri).encode() + b"|Lorem ipsum")
+            self.assertEqual(cache.get(uri)["content"], "Lorem ipsum")
+            cache.set(uri, None)
+            self.assertEqual(_cache.get(key), str(uri).encode() + b"|__None__")
+            self.assertIsNone(cache.get(uri)["content"])
+
+            # Legacy values are still decoded
+            _cache.set(key, legacy_value)
+            self.assertEqual(cache.get(uri), {"uri": uri, "content": content})
+
+        with self.assertRaises(ImproperlyConfigured):
+            DjangoCacheBackend(VALUE_FORMAT={"COMPRESSION": "foo"})
+
+
+@skipUnless(fakeredis, "fakeredis is not installed")
+class RedisCacheTest(DjediTest):
+    config = {"CLIENT_CLASS": "fakeredis.FakeRedis", "URL": "redis://djedi-test/0"}
+
+    def setUp(self):
+        super().setUp()
+        self.backend = RedisCacheBackend(**self.config)
+        self.addCleanup(self.backend.clear)
+
+    def test_get_set_delete(self):
+        uri = URI("i18n://sv-se@page/title.txt#1")
+        self.assertIsNone(self.backend.get(uri))
+
+        self.backend.set_many({uri: "Title", URI("i18n://sv-se@page/body.txt#1"): None})
+        self.assertEqual(
+            self.backend._build_cache_key(uri),
+            "djedi:i18n:sv-se:" + sha1(b"i18n://sv-se@page/title").hexdigest(),
+        )
+        nodes = self.backend.get_many(
+            [URI("i18n://sv-se@page/title"), URI("i18n://sv-se@page/body")]
+        )
+        self.assertEqual(nodes[URI("i18n://sv-se@page/title")]["content"], "Title")
+        self.assertIsNone(nodes[URI("i18n://sv-se@page/body")]["content"])
+
+        self.backend.delete(uri)
+        self.assertIsNone(self.backend.get(uri))
+
+    def test_clear_namespace(self):
+        self.backend.set(URI("i18n://sv-se@page/title.txt#1"), "Titel")
+        self.backend.set(URI("i18n://en-us@page/title.txt#1"), "Title")
+
+        self.backend.clear("i18n://sv-se")
+        self.assertIsNone(self.backend.get(URI("i18n://sv-se@page/title")))
+        self.assertIsNotNone(self.backend.get(URI("i18n://en-us@page/title")))
+
+    def test_invalidation(self):
+        uri = URI("i18n://sv-se@page/title.txt#1")
+        backend = RedisCacheBackend(L1={"TIMEOUT": 60}, **self.config)
+        other = RedisCacheBackend(L1={"TIMEOUT": 60}, **self.config)
+        self.addCleanup(backend.close)
+
+        # Subscriber is started on first use
+        self.assertIsNone(backend._subscriber)
+        other.set(uri, "Title")
+        self.assertEqual(backend.get(uri)["content"], "Title")
+
+        # Changes by other processes evict local entries
+        other.set(uri, "Titel")
+        deadline = time.monotonic() + 5
+        while backend.get(uri)["content"] != "Titel":
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+        # Fills and backends without L1 don't publish invalidations
+        pubsub = self.backend._client.pubsub(ignore_subscribe_messages=True)
+        self.addCleanup(pubsub.close)
+        pubsub.subscribe(other.channel)
+        pubsub.get_message(timeout=0.1)
+        other.fill_many({uri: "Titel"})
+        self.backend.set(uri, "Titel")
+        self.assertIsNone(pubsub.get_message(timeout=0.1))
+
+        # Subscriber is restarted, and local entries dropped, in forked processes
+        subscriber = backend._subscriber
+        with mock.patch("os.getpid", return_value=-1):
+            backend._subscribe()
+            self.assertEqual(len(backend._local), 0)
+            self.assertEqual(backend.get(uri)["content"], "Titel")
+        self.assertIsNot(backend._subscriber, subscriber)
+        subscriber.stop()
+
+        # Subscriber is stopped when backend is dropped
+        subscriber = other._subscriber
+        del other
+        gc.collect()
+        subscriber.join(5)
+        self.assertFalse(subscriber.is_alive())
+
+    def test_pipeline(self):
+        with self.settings(
+            DJEDI_CACHE=dict(self.config, BACKEND="djedi.backends.redis.Backend")
+        ):
+            cio.set("i18n://sv-se@page/title.txt", "Djedi")
+            self.assertEqual(cio.get("page/title", lazy=False).content, "Djedi")
+            self.assertIsNotNone(self.backend.get(URI("i18n://sv-se@page/title")))
@@ -1,20 +1,36 @@
+import hashlib
 import os
+import re
+from unittest import mock
 from urllib.parse import quote
 
 import simplejson as json
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
 from django.core.files import File
+from django.template import engines
 from django.test import Client
 from django.urls import reverse
 from django.utils.encoding import smart_str
 
 import cio
 import cio.conf
-from cio.backends import storage
+from cio.backends import cache, storage
 from cio.backends.exceptions import NodeDoesNotExist, PersistenceError
+from cio.node import Node
 from cio.plugins import plugins
 from cio.utils.uri import URI
+from djedi import esi
 from djedi.plugins.form import BaseEditorForm
 from djedi.tests.base import ClientTest, DjediTest, UserMixin
+from djedi.utils.encoding import (
+    get_json_encoder,
+    iter_json_mapping,
+    json_dumps,
+    orjson,
+    orjson_dumps,
+    simplejson_dumps,
+)
 
 
 def json_node(response, simple=True):
@@ -85,6 +101,25 @@ class PrivateRestTest(ClientTest):
         self.assertEqual(node["uri"], "i18n://sv-se@page/title.md#draft")
         self.assertRenderedMarkdown(node["content"], "# Djedi")
 
+    def test_get_etag(self):
+        cio.set("i18n://sv-se@page/title.txt", "Djedi")
+
+        response = self.get("api", "i18n://sv-se@page/title")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        url = self.get_api_url("api", "i18n://sv-se@page/title")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH="W/" + etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+        cio.set("i18n://sv-se@page/title.txt", "Djedi 2")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
     def test_load(self):
         response = self.get("api.load", "i18n://sv-se@page/title")
         self.assertEqual(response.status_code, 200)
@@ -196,6 +231,107 @@ class PrivateRestTest(ClientTest):
 
         self.assertEqual(response.status_code, 404)
 
+    def test_bulk(self):
+        url = reverse("admin:djedi:api.nodes")
+        response = self.client.post(
+            url,
+            json.dumps({"sv-se@page/title": "Djedi", "sv-se@page/body.md": "# Djedi"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        nodes = json.loads(response.content)
+        self.assertKeys(
+            nodes,
+            "i18n://sv-se@page/title.txt#draft",
+            "i18n://sv-se@page/body.md#draft",
+        )
+        body = nodes["i18n://sv-se@page/body.md#draft"]
+        self.assertRenderedMarkdown(body["content"], "# Djedi")
+        self.assertEqual(body["meta"]["author"], "master")
+
+        # Session and user lookups, a revision select and a matched node select
+        with self.assertDB(selects=4, updates=2), self.assertCache(calls=1, sets=2):
+            response = self.client.put(
+                url,
+                json.dumps(list(nodes.keys()) + ["sv-se@page/missing"]),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        nodes = json.loads(response.content)
+        self.assertEqual(
+            nodes["i18n://sv-se@page/body.md#draft"]["uri"],
+            "i18n://sv-se@page/body.md#1",
+        )
+
+        node = cio.get("i18n://sv-se@page/body", lazy=False)
+        self.assertEqual(node.uri, "i18n://sv-se@page/body.md#1")
+        self.assertRenderedMarkdown(node.content, "# Djedi")
+
+    def test_batch(self):
+        cio.set("sv-se@page/title", "Djedi 1")
+        cio.set("sv-se@page/title", "Djedi 2")
+        cio.set("sv-se@page/body.md", "# Djedi", publish=False)
+
+        url = reverse("admin:djedi:api.batch")
+        uris = ["i18n://sv-se@page/title", "i18n://sv-se@page/body"]
+
+        # Session and user lookups, uncached get, load draft/published levels and revisions
+        with self.assertDB(selects=2 + 1 + 2 + 1):
+            response = self.client.post(
+                url,
+                json.dumps({"get": uris, "load": uris, "revisions": uris}),
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        content = json.loads(response.content)
+
+        self.assertEqual(
+            content["get"],
+            {
+                "i18n://sv-se@page/title": {
+                    "uri": "i18n://sv-se@page/title.txt#2",
+                    "content": "Djedi 2",
+                },
+                "i18n://sv-se@page/body": None,
+            },
+        )
+
+        title = content["load"]["i18n://sv-se@page/title"]
+        self.assertEqual(title["uri"], "i18n://sv-se@page/title.txt#2")
+        self.assertEqual(title["data"], "Djedi 2")
+        body = content["load"]["i18n://sv-se@page/body"]
+        self.assertEqual(body["uri"], "i18n://sv-se@page/body.md#draft")
+        self.assertEqual(body["data"], "# Djedi")
+        self.assertRenderedMarkdown(body["content"], "# Djedi")
+
+        self.assertEqual(
+            content["revisions"],
+            {
+                "i18n://sv-se@page/title": [
+                    ["i18n://sv-se@page/title.txt#1", False],
+                    ["i18n://sv-se@page/title.txt#2", True],
+                ],
+                "i18n://sv-se@page/body": [["i18n://sv-se@page/body.md#draft", False]],
+            },
+        )
+
+        # Uris sharing a level uri all get the draft
+        cio.set("sv-se@page/title", "Djedi 3", publish=False)
+        uris = ["i18n://sv-se@page/title", "i18n://sv-se@page/title#draft"]
+        response = self.client.post(
+            url, json.dumps({"load": uris}), content_type="application/json"
+        )
+        content = json.loads(response.content)
+        for uri in uris:
+            title = content["load"][uri]
+            self.assertEqual(title["uri"], "i18n://sv-se@page/title.txt#draft")
+            self.assertEqual(title["data"], "Djedi 3")
+
+        response = self.client.post(
+            url, json.dumps({"delete": uris}), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
     def test_revisions(self):
         cio.set("sv-se@page/title", "Djedi 1")
         cio.set("sv-se@page/title", "Djedi 2")
@@ -273,6 +409,15 @@ class PrivateRestTest(ClientTest):
             self.assertEqual(response.status_code, 200)
             self.assertIn(b'document.domain = "foobar.se"', response.content)
 
+        response = self.client.post(
+            self.get_api_url("cms.editor", "sv-se@page/title"),
+            {"data": "Djedi"},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        node = json_node(response, simple=False)
+        self.assertEqual(node["content"], "Djedi")
+        self.assertNotIn("rendered", node["meta"])
+
     def test_image_dataform(self):
         from djedi.plugins.img import DataForm
 
@@ -386,3 +531,233 @@ class PublicRestTest(ClientTest):
         )
         self.assertIn("i18n://sv-se@rest/label/email.txt#1", json_content.keys())
         self.assertEqual(json_content["i18n://sv-se@rest/label/email.txt#1"], "E-post")
+
+        # Responses are indented by default
+        self.assertIn(b"\n", response.content)
+        with self.settings(DJEDI_JSON={"INDENT": None}):
+            response = self.client.post(
+                url,
+                json.dumps({"rest/label/email": "E-mail"}),
+                content_type="application/json",
+            )
+        self.assertNotIn(b"\n", response.content)
+
+        # Caching gets is only disabled within the api request
+        with self.assertCache(sets=1):
+            cio.get("rest/page/body.md", default="# Foo Bar", lazy=False)
+
+        # Cache pipes not able to disable caching gets would cache untrusted defaults
+        pipeline = ["cio.pipeline.pipes.cache.CachePipe", "djedi.pipeline.StoragePipe"]
+        with self.settings(DJEDI_PIPELINE=pipeline):
+            with self.assertRaises(ImproperlyConfigured):
+                self.client.post(
+                    url,
+                    json.dumps({"rest/page/title": "Poisoned"}),
+                    content_type="application/json",
+                )
+
+    def test_nodes_etag(self):
+        url = reverse("admin:djedi:rest:nodes")
+        query = {"rest/label/email": "E-mail"}
+
+        response = self.client.get(url, query)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content),
+            {"i18n://sv-se@rest/label/email.txt": "E-mail"},
+        )
+        self.assertIn("no-cache", response["Cache-Control"])
+        etag = response["ETag"]
+
+        # Validated without resolving nodes
+        with mock.patch("djedi.rest.api.cio.get") as get:
+            response = self.client.get(url, query, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        get.assert_not_called()
+
+        # Other defaults, and publishing, change the ETag
+        response = self.client.get(url, {"rest/label/email": "Email"})
+        self.assertNotEqual(response["ETag"], etag)
+
+        cio.set("sv-se@rest/label/email", "E-post")
+        response = self.client.get(url, query, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content),
+            {"i18n://sv-se@rest/label/email.txt#1": "E-post"},
+        )
+
+        # and so do deleting published nodes
+        etag = response["ETag"]
+        cio.delete("sv-se@rest/label/email#1")
+        response = self.client.get(url, query, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        # Posted nodes are not validated
+        response = self.client.post(
+            url,
+            json.dumps(query),
+            content_type="application/json",
+            HTTP_IF_NONE_MATCH="*",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_nodes_stream(self):
+        cio.set("sv-se@rest/label/email", "E-post")
+        url = reverse("admin:djedi:rest:nodes")
+
+        with self.settings(DJEDI_JSON={"STREAM_THRESHOLD": 1}):
+            response = self.client.post(
+                url,
+                json.dumps({"rest/label/email": "E-mail", "rest/label/name": "Name"}),
+                content_type="application/json",
+            )
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            json.loads(b"".join(response.streaming_content)),
+            {
+                "i18n://sv-se@rest/label/email.txt#1": "E-post",
+                "i18n://sv-se@rest/label/name.txt": "Name",
+            },
+        )
+
+    def test_stats(self):
+        url = reverse("admin:djedi:rest:stats")
+        response = self.client.get(url)
+        self.assertEqual(json.loads(response.content), {"cache": None})
+
+        with self.settings(
+            DJEDI_CACHE={
+                "BACKEND": "djedi.backends.django.cache.Backend",
+                "STATS": True,
+                "L1": True,
+            }
+        ):
+            cio.set("sv-se@rest/label/email", "E-post")
+            cache.clear()
+            cio.get("rest/label/email", lazy=False)
+            cio.get("rest/label/email", lazy=False)
+
+            response = self.client.get(url)
+            stats = json.loads(response.content)["cache"]
+            self.assertEqual(stats["hits"], 0)
+            self.assertEqual(stats["misses"], 1)
+            self.assertEqual(stats["local_hits"], 1)
+            self.assertEqual(stats["sets"], 2)
+            self.assertEqual(stats["hit_rate"], 0.5)
+            self.assertGreater(stats["bytes_written"], 0)
+            self.assertEqual(stats["latency"]["get_many"]["count"], 1)
+            self.assertEqual(stats["latency"]["get_many"]["buckets"]["+Inf"], 1)
+
+        self.client.logout()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_esi_fragment(self):
+        source = """{% load djedi_tags %}
+            {% node 'page/title' default='Title' %}
+            {% blocknode 'page/body' name='Djedi' %}Hello {name}{% endblocknode %}
+            {% blocknode 'page/footer' %}Copyright{% endblocknode %}
+        """
+
+        template = engines["django"].from_string(source)
+        request = mock.Mock(user=mock.Mock(is_superuser=False, is_staff=False))
+
+        with mock.patch.dict(esi._stored_defaults, clear=True), self.settings(
+            DJEDI_ESI={"PURGE_URLS": ["http://varnish/"]}
+        ):
+            # Nodes rendered without request, e.g. for emails, are inlined
+            html = template.render({})
+            self.assertNotIn("esi:include", html)
+
+            html = template.render({"request": request})
+            src, footer_src = re.findall(r'<esi:include src="(.+)" />', html)
+            base_url = reverse("admin:djedi:rest:api-base")
+            self.assertTrue(src.startswith(base_url + "fragment/"))
+            # Nodes rendered with context are inlined
+            self.assertIn('<span data-i18n="sv-se@page/body">Hello Djedi</span>', html)
+
+            # Defaults are signed by key, not content
+            _, default_key, _, _ = esi.loads(src.rsplit("/", 2)[1])
+            self.assertEqual(default_key, hashlib.sha1(b"Title").hexdigest())
+
+            response = self.client.get(src)
+            self.assertEqual(
+                smart_str(response.content),
+                '<span data-i18n="sv-se@page/title">Title</span>',
+            )
+            self.assertEqual(response["Cache-Control"], "public, max-age=86400")
+            self.assertEqual(
+                response["Surrogate-Key"], esi.surrogate_key("i18n://page/title")
+            )
+
+            response = self.client.get(footer_src)
+            self.assertIn("Copyright", smart_str(response.content))
+
+            response = self.client.get(src.replace("/fragment/", "/fragment/x"))
+            self.assertEqual(response.status_code, 404)
+
+            # Fragments with evicted defaults are not cached
+            caches["default"].clear()
+            response = self.client.get(src)
+            self.assertNotIn("Title", smart_str(response.content))
+            self.assertIn("no-cache", response["Cache-Control"])
+
+            # Fragments are purged by surrogate key on publish, in the background
+            with mock.patch("djedi.esi.urlopen") as urlopen:
+                cio.set("i18n://sv-se@page/title.txt", "Djedi")
+                esi._purger.submit(lambda: None).result()
+            (request,), kwargs = urlopen.call_args
+            self.assertEqual(request.method, "PURGE")
+            self.assertEqual(request.full_url, "http://varnish/")
+            self.assertEqual(
+                request.get_header("Surrogate-key"),
+                esi.surrogate_key("i18n://sv-se@page/title.txt"),
+            )
+
+            response = self.client.get(src)
+            self.assertIn("Djedi", smart_str(response.content))
+            self.assertEqual(response["Cache-Control"], "public, max-age=86400")
+
+            # Editors get nodes inlined
+            request = mock.Mock(user=mock.Mock(is_superuser=True))
+            html = template.render({"request": request})
+            self.assertNotIn("esi:include", html)
+
+
+class EncodingTest(DjediTest):
+    def test_encoders(self):
+        node = Node("i18n://sv-se@page/title.txt#1", "Djedi")
+        data = {URI("i18n://sv-se@page/title"): node}
+        expected = {
+            "i18n://sv-se@page/title": {
+                "uri": "i18n://sv-se@page/title.txt#1",
+                "content": "Djedi",
+                "meta": {},
+            }
+        }
+
+        encoders = ["simplejson", simplejson_dumps]
+        if orjson is not None:
+            encoders.append("orjson")
+
+        for encoder in encoders:
+            with cio.conf.settings(JSON={"ENCODER": encoder}):
+                compact = json_dumps(data)
+                self.assertEqual(json.loads(compact), expected)
+                self.assertNotIn(" ", smart_str(compact))
+                self.assertEqual(json.loads(json_dumps(data, indent=4)), expected)
+
+        if orjson is not None:
+            with cio.conf.settings(
+                JSON={"ENCODER": "djedi.utils.encoding.orjson_dumps"}
+            ):
+                self.assertIs(get_json_encoder(), orjson_dumps)
+                with self.assertRaises(TypeError):
+                    json_dumps(object())
+
+        chunks = list(iter_json_mapping({"a": 1, "b": [2]}, chunk_size=1))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(json.loads(b"".join(chunks)), {"a": 1, "b": [2]})
@@ -0,0 +1,160 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+
+import cio
+from cio.backends import storage
+from cio.backends.exceptions import PersistenceError
+from cio.plugins.md import MarkdownPlugin
+from cio.utils.uri import URI
+from djedi.backends.django.db.models import Node, PublishedNode
+from djedi.tests.base import AssertionMixin, DjediTest
+
+STORAGE_BACKEND = "djedi.backends.django.db.Backend"
+
+
+class StorageTest(DjediTest, AssertionMixin):
+    def test_get_many(self):
+        for i in range(3):
+            cio.set("i18n://sv-se@page/title.txt", "Title %d" % i)
+        cio.set("i18n://sv-se@page/body.md", "# Body", publish=False)
+
+        uris = [
+            URI("i18n://sv-se@page/title"),
+            URI("i18n://sv-se@page/title.txt#2"),
+            URI("i18n://sv-se@page/body"),
+            URI("i18n://sv-se@page/body#draft"),
+            URI("i18n://sv-se@page/missing"),
+        ]
+
+        with self.assertDB(calls=1):
+            nodes = storage.backend.get_many(uris)
+
+        self.assertKeys(nodes, uris[0], uris[1], uris[3])
+        self.assertEqual(nodes[uris[0]]["uri"], "i18n://sv-se@page/title.txt#3")
+        self.assertEqual(nodes[uris[0]]["content"], "Title 2")
+        self.assertTrue(nodes[uris[0]]["meta"]["is_published"])
+        self.assertEqual(nodes[uris[1]]["content"], "Title 1")
+        self.assertFalse(nodes[uris[1]]["meta"]["is_published"])
+        self.assertEqual(nodes[uris[3]]["uri"], "i18n://sv-se@page/body.md#draft")
+
+        with self.assertDB(calls=0):
+            self.assertEqual(storage.backend.get_many([]), {})
+
+
+class PublishedNodesTest(DjediTest, AssertionMixin):
+    def test_published_nodes(self):
+        cio.set("i18n://sv-se@page/title.txt", "Title 1")
+
+        with self.settings(
+            DJEDI_STORAGE={"BACKEND": STORAGE_BACKEND, "PUBLISHED_NODES": True}
+        ):
+            call_command("djedi_backfill_published", stdout=StringIO())
+            self.assertEqual(PublishedNode.objects.get().version, "1")
+
+            cio.set("i18n://sv-se@page/title.txt", "Title 2")
+            cio.set("i18n://sv-se@page/body.txt", "Body", publish=False)
+            published_node = PublishedNode.objects.get()
+            self.assertEqual(published_node.version, "2")
+            self.assertEqual(published_node.content, "Title 2")
+
+            uris = [
+                URI("i18n://sv-se@page/title"),
+                URI("i18n://sv-se@page/body"),
+            ]
+            with self.assertDB(calls=1):
+                nodes = storage.backend.get_many(uris)
+            self.assertKeys(nodes, uris[0])
+            self.assertEqual(nodes[uris[0]]["uri"], "i18n://sv-se@page/title.txt#2")
+            self.assertEqual(nodes[uris[0]]["content"], "Title 2")
+            self.assertTrue(nodes[uris[0]]["meta"]["is_published"])
+
+            cio.delete("i18n://sv-se@page/title.txt#2")
+            self.assertFalse(PublishedNode.objects.exists())
+
+
+class PrerenderTest(DjediTest, AssertionMixin):
+    def test_prerender(self):
+        with self.settings(
+            DJEDI_STORAGE={
+                "BACKEND": STORAGE_BACKEND,
+                "PUBLISHED_NODES": True,
+                "PRERENDER": True,
+            }
+        ):
+            cio.set("i18n://sv-se@page/body.md", "# Djedi", publish=False)
+            self.assertIsNone(Node.objects.get().rendered)
+
+            cio.publish("i18n://sv-se@page/body.md#draft")
+            self.assertEqual(Node.objects.get().rendered, "<h1>Djedi</h1>")
+            self.assertEqual(PublishedNode.objects.get().rendered, "<h1>Djedi</h1>")
+
+            with mock.patch.object(MarkdownPlugin, "render") as render:
+                node = cio.get("i18n://sv-se@page/body")
+                self.assertEqual(node.content, "<h1>Djedi</h1>")
+                self.assertNotIn("rendered", node.meta)
+                render.assert_not_called()
+
+            # Editing published revisions keeps rendered content in sync
+            cio.set("i18n://sv-se@page/body.md#1", "# Lightning", publish=False)
+            self.assertEqual(Node.objects.get().rendered, "<h1>Lightning</h1>")
+            self.assertNotIn("rendered", Node.objects.get().meta)
+
+            # Drafts are rendered on read
+            cio.set("i18n://sv-se@page/body.md#draft", "# Fast", publish=False)
+            node = cio.get("i18n://sv-se@page/body#draft", lazy=False)
+            self.assertEqual(node.content, "<h1>Fast</h1>")
+
+
+class BulkStorageTest(DjediTest, AssertionMixin):
+    def test_set_many(self):
+        cio.set("i18n://sv-se@page/title.txt#draft", "Title", publish=False)
+
+        nodes = {
+            URI("i18n://sv-se@page/title.txt#draft"): "Title 2",
+            URI("i18n://sv-se@page/body.md#draft"): "# Body",
+        }
+        with self.assertDB(selects=1, inserts=1, updates=1):
+            nodes = storage.backend.set_many(nodes, author="master")
+
+        title = nodes["i18n://sv-se@page/title.txt#draft"]
+        self.assertEqual(title["content"], "Title 2")
+        self.assertEqual(title["meta"]["author"], "master")
+        self.assertIn("modified_at", title["meta"])
+        body = storage.get("i18n://sv-se@page/body#draft")
+        self.assertEqual(body["content"], "# Body")
+
+        with self.assertRaises(PersistenceError):
+            storage.backend.set_many({URI("i18n://sv-se@page/foo.txt#draft"): None})
+
+    def test_publish_many(self):
+        cio.set("i18n://sv-se@page/title.txt", "Title 1")
+        cio.set("i18n://sv-se@page/title.txt#draft", "Title 2", publish=False)
+        cio.set("i18n://sv-se@page/body.txt#draft", "Body", publish=False)
+
+        uris = [
+            URI("i18n://sv-se@page/title.txt#draft"),
+            URI("i18n://sv-se@page/body#draft"),
+            URI("i18n://sv-se@page/missing#draft"),
+        ]
+        # Revisions are selected without content, matched nodes in full
+        with self.assertDB(selects=2, updates=2):
+            nodes = storage.backend.publish_many(uris, published_at=1)
+
+        self.assertKeys(nodes, uris[0], uris[1])
+        self.assertEqual(nodes[uris[0]]["uri"], "i18n://sv-se@page/title.txt#2")
+        self.assertEqual(nodes[uris[1]]["uri"], "i18n://sv-se@page/body.txt#1")
+        self.assertTrue(nodes[uris[0]]["meta"]["is_published"])
+        self.assertEqual(nodes[uris[0]]["meta"]["published_at"], 1)
+        self.assertEqual(
+            cio.revisions("i18n://sv-se@page/title"),
+            [
+                ("i18n://sv-se@page/title.txt#1", False),
+                ("i18n://sv-se@page/title.txt#2", True),
+            ],
+        )
+
+        # Publishing already published versions is a no-op
+        with self.assertDB(selects=2, updates=0):
+            storage.backend.publish_many([URI("i18n://sv-se@page/title.txt#2")])
@@ -1,9 +1,14 @@
+from unittest import mock
+
 from django.contrib.auth.models import User
 from django.template import TemplateSyntaxError, engines
 
 import cio
 from cio.backends import cache
+from cio.node import Node
 from cio.pipeline import pipeline
+from djedi.instrumentation import RoundTripWarning, TooManyRoundTrips, limit_round_trips
+from djedi.templatetags.djedi_tags import get_manifest
 from djedi.templatetags.template import register
 from djedi.tests.base import AssertionMixin, DjediTest
 
@@ -29,7 +34,7 @@ class TagTest(DjediTest, AssertionMixin):
 
         cache.clear()
 
-        with self.assertCache(calls=1, misses=2):
+        with self.assertCache(calls=2, misses=2, sets=2):
             with self.assertDB(calls=1):
                 html = self.render(
                     "<h1>{% node 'page/title' edit=False %}</h1><p>{% node 'page/body' %}</p>"
@@ -113,16 +118,120 @@ class TagTest(DjediTest, AssertionMixin):
         )
         assert html == "Hej {name}!"
 
+    def test_render_cache(self):
+        cio.set("i18n://sv-se@page/title.txt", "Hej {name}!")
+        source = """
+            {% blocknode 'page/title' edit=False name=name %}
+                Hello {name}!
+            {% endblocknode %}
+        """
+
+        with self.settings(
+            DJEDI_CACHE={
+                "BACKEND": "djedi.backends.django.cache.Backend",
+                "RENDER_CACHE": True,
+            }
+        ), mock.patch.object(
+            Node._formatter, "format", wraps=Node._formatter.format
+        ) as format:
+            assert self.render(source, {"name": "Jonas"}) == "Hej Jonas!"
+            assert self.render(source, {"name": "Jonas"}) == "Hej Jonas!"
+            assert format.call_count == 1
+
+            assert self.render(source, {"name": "Lundberg"}) == "Hej Lundberg!"
+            assert format.call_count == 2
+
+            cio.set("i18n://sv-se@page/title.txt", "Hallå {name}!")
+            assert self.render(source, {"name": "Jonas"}) == "Hallå Jonas!"
+            assert format.call_count == 3
+
+            # Published versions updated in place drop cached renders
+            cio.set("i18n://sv-se@page/title.txt#2", "Hej då {name}!")
+            assert self.render(source, {"name": "Jonas"}) == "Hej då Jonas!"
+            assert format.call_count == 4
+
+            # Context values without reliable repr are never cached
+            context = {"name": User(first_name="Jonas")}
+            self.render(source, context)
+            self.render(source, context)
+            assert format.call_count == 6
+
     def test_collected_nodes(self):
         source = """
             {% node 'page/title' edit=False %}
             {% node 'page/title' default='fallback' edit=False %}
             {% node 'page/body' edit=False %}
+            {% node 'page/body' edit=False %}
         """
         pipeline.history.clear()
-        self.render(source)
+        with mock.patch("djedi.templatetags.djedi_tags.cio.get", wraps=cio.get) as get:
+            self.render(source)
         assert len(pipeline.history) == 2
 
+        # Repeated nodes are buffered once
+        assert get.call_count == 3
+
+    def test_manifest(self):
+        template = engines["django"].get_template("manifest/page.html")
+        self.assertEqual(
+            get_manifest(template.template),
+            [
+                ("page/title", "Title"),
+                ("page/body", "Body"),
+                ("page/footer", "Footer"),
+            ],
+        )
+
+        cio.set("i18n://sv-se@page/title.txt", "Djedi")
+        cio.set("i18n://sv-se@page/footer.txt", "Lightning fast!")
+        cache.clear()
+
+        # All nodes of template, extended and included templates are fetched at once
+        with self.assertCache(calls=2, misses=3), self.assertDB(calls=1):
+            html = template.render(
+                {"show_footer": True, "footer": "manifest/footer.html"}
+            )
+        html = " ".join(html.split())
+        assert (
+            html == "<h1>Djedi</h1> Body <p>Lightning fast!</p> <p>Lightning fast!</p>"
+        )
+
+        # Nodes are fetched per render
+        cio.set("i18n://sv-se@page/title.txt", "Djedi CMS")
+        with self.assertCache(calls=1, hits=3), self.assertDB(calls=0):
+            html = template.render(
+                {"show_footer": False, "footer": "manifest/footer.html"}
+            )
+        assert " ".join(html.split()) == "<h1>Djedi CMS</h1> Body"
+
+    def test_round_trips(self):
+        template = engines["django"].get_template("manifest/page.html")
+
+        with limit_round_trips(1) as recorder:
+            template.render({"footer": "manifest/footer.html"})
+        assert recorder.counts["flush"] == 1
+
+        # Nodes of dynamically included templates are fetched in extra round trips
+        with self.assertRaises(TooManyRoundTrips) as raised:
+            with limit_round_trips(1):
+                template.render({"footer": "manifest/sidebar.html"})
+        assert "in 2 round trips, expected at most 1" in str(raised.exception)
+        assert "2. manifest/sidebar.html: {% node 'page/sidebar' %}" in str(
+            raised.exception
+        )
+
+        with limit_round_trips(3) as recorder:
+            template.render({"footer": "manifest/sidebar.html"})
+            cio.get("page/title").flush()
+        assert recorder.flush_origins == [
+            "manifest/base.html: {% node 'page/title' %}",
+            "manifest/sidebar.html: {% node 'page/sidebar' %}",
+            None,
+        ]
+
+        with self.assertWarnsRegex(RoundTripWarning, "3. <outside templates>"):
+            recorder.check_round_trips(2)
+
     def test_invalid_lazy_tag(self):
         with self.assertRaises(TemplateSyntaxError):
             register.lazy_tag("")
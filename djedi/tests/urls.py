@@ -1,11 +1,26 @@
+import asyncio
+
 from django.contrib import admin
+from django.http import HttpResponse
 from django.shortcuts import render
 from django.urls import include, re_path
 
+from djedi import aio
+
 admin.autodiscover()
 
+
+async def async_index(request):
+    node = await aio.get("foo/async", default="Async")
+    # Let concurrent requests interleave
+    await asyncio.sleep(0.01)
+    title = await aio.get("foo/title", default="Title")
+    return HttpResponse(f"<html><body>{node.content} {title.content}</body></html>")
+
+
 urlpatterns = [
     re_path(r"^$", lambda r: render(r, "index.html"), name="index"),
+    re_path(r"^async/$", async_index, name="async_index"),
     re_path(r"^adm1n/", admin.site.urls),
     re_path(r"^djed1/", include("djedi.urls", namespace="admin")),
 ]
@@ -0,0 +1,57 @@
+import time
+
+from django.core.cache import InvalidCacheBackendError, caches
+
+PUBLISHED_VERSION_KEY = "djedi.published"
+
+
+def get_shared_cache():
+    """
+    Get django cache shared by all processes. Look for djedi specific cache first, then fallback on default.
+    """
+    try:
+        return caches["djedi"]
+    except InvalidCacheBackendError:
+        return caches["default"]
+
+
+def get_counter(key):
+    cache = get_shared_cache()
+    value = cache.get(key)
+    if value is None:
+        _init_counter(cache, key)
+        value = cache.get(key)
+    return value
+
+
+def bump_counter(key):
+    cache = get_shared_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        _init_counter(cache, key)
+        return cache.incr(key)
+
+
+def _init_counter(cache, key):
+    # Seed with current time to never reuse the value of an evicted counter
+    cache.add(key, int(time.time() * 1000), timeout=None)
+
+
+def get_published_version():
+    """
+    Version of published content, bumped by any process changing published nodes.
+    """
+    return get_counter(PUBLISHED_VERSION_KEY)
+
+
+def bump_published_version(sender=None, **kwargs):
+    bump_counter(PUBLISHED_VERSION_KEY)
+
+
+def watch_published_version():
+    from ..signals import nodes_published
+
+    nodes_published.connect(
+        bump_published_version, dispatch_uid="djedi.utils.cache.bump_published_version"
+    )
@@ -0,0 +1,81 @@
+from itertools import islice
+
+import simplejson as json
+from django.utils.module_loading import import_string
+
+from cio.conf import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _default(obj):
+    if hasattr(obj, "for_json"):
+        return obj.for_json()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def simplejson_dumps(obj, indent=None):
+    separators = None if indent else (",", ":")
+    return json.dumps(obj, indent=indent, separators=separators, for_json=True)
+
+
+def orjson_dumps(obj, indent=None):
+    # orjson only supports two space indentation
+    option = orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=_default, option=option)
+
+
+ENCODERS = {
+    "simplejson": simplejson_dumps,
+    "orjson": orjson_dumps,
+}
+
+
+def get_json_encoder():
+    """
+    Returns configured json dumps function, using orjson when installed by default.
+    """
+    encoder = settings.get("JSON", {}).get("ENCODER")
+
+    if encoder is None:
+        encoder = "orjson" if orjson is not None else "simplejson"
+
+    if callable(encoder):
+        return encoder
+    elif encoder in ENCODERS:
+        return ENCODERS[encoder]
+    else:
+        return import_string(encoder)
+
+
+def json_dumps(obj, indent=None):
+    return get_json_encoder()(obj, indent=indent)
+
+
+def iter_json_mapping(mapping, chunk_size=1000):
+    """
+    Encode mapping as a json object in chunks of items, to stream large payloads.
+    """
+    dumps = get_json_encoder()
+    items = iter(mapping.items())
+    separator = b""
+
+    yield b"{"
+    while True:
+        chunk = dict(islice(items, chunk_size))
+        if not chunk:
+            break
+
+        # Encode chunk as an object and strip its braces
+        yield separator + _bytes(dumps(chunk))[1:-1]
+        separator = b","
+    yield b"}"
+
+
+def _bytes(value):
+    return value.encode("utf-8") if isinstance(value, str) else value
@@ -10,6 +10,7 @@ install_requires = [
 
 tests_require = [
     "coverage",
+    "fakeredis",
     "Markdown <= 3.3.0",
     "Pillow",
 ]
@@ -69,6 +70,9 @@ setup(
     install_requires=install_requires,
     extras_require={
         "tests": tests_require,
+        "orjson": ["orjson"],
+        "lz4": ["lz4"],
+        "redis": ["redis"],
     },
     tests_require=tests_require,
     test_suite="runtests.main",